@@ -31,19 +31,138 @@
 	DEPENDENCIES:
 		pip install python-Levenshtein
 		pip install fuzzywuzzy
-		pip install numpy
+		pip install ngram
+
+		fuzzywuzzy & ngram are only loaded once a learner starts working (see load),
+		importing this module doesn't read any data nor start any thread.
+
+	In order to execute the program
+
+		python context.py <path-to-file> <field-index> [<field-index> ...] [--xchar ,] [--learner cleanse|simple] [--sizes 1]
 
 """
 
 
-from __future__ import division
+from __future__ import division, print_function
 from threading import Thread, RLock
 import re
-import numpy as np
-from sets import Set
-from fuzzywuzzy import fuzz, process
-from ngram import NGram
-from Queue import Queue
+from array import array
+from itertools import chain
+from queue import Queue, Empty, Full
+
+fuzz	= None
+NGram	= None
+
+"""
+	Loads the fuzzy matching dependencies on demand, they are expensive to import
+	and are of no use to a process that never learns context.
+"""
+def load():
+	global fuzz, NGram
+	if fuzz is None or NGram is None:
+		from fuzzywuzzy import fuzz as _fuzz
+		from ngram import NGram as _NGram
+		fuzz	= _fuzz
+		NGram	= _NGram
+
+"""
+	The vocabulary interns the terms found in a field: every distinct term is stored once
+	and phrases are expressed as arrays of integer ids
+"""
+class Vocabulary:
+	def __init__(self):
+		self.ids	= {}
+		self.terms	= []
+	def __len__(self):
+		return len(self.terms)
+	"""
+		Returns the id of a term, the term is added to the vocabulary if it's not known yet
+		@param term	term of a phrase
+	"""
+	def id(self,term):
+		if term not in self.ids:
+			self.ids[term] = len(self.terms)
+			self.terms.append(term)
+		return self.ids[term]
+	def encode(self,terms):
+		return array('i',[self.id(term) for term in terms])
+	def decode(self,ids):
+		return [self.terms[id] for id in ids]
+
+"""
+	A bag holds phrases of identical length (n-grams) back to back in a contiguous buffer of ids,
+	phrase i lives in buffer[i*size:(i+1)*size]. Duplicate phrases are ignored while the bag is open,
+	they provide very little context for learning.
+"""
+class Bag:
+	def __init__(self,size,vocab):
+		self.size	= size
+		self.vocab	= vocab
+		self.buffer	= array('i')
+		self.index	= set()
+	def __len__(self):
+		return len(self.buffer) // self.size
+	def __getitem__(self,i):
+		if i < 0 :
+			i = len(self) + i
+		return tuple(self.buffer[i*self.size:(i+1)*self.size])
+	def __iter__(self):
+		for i in range(0,len(self)):
+			yield self[i]
+	"""
+		Adds a phrase to the bag and returns whether it was new
+		@param ids	phrase as an array of ids
+	"""
+	def add(self,ids):
+		key = ids.tobytes()
+		if key in self.index:
+			return False
+		self.index.add(key)
+		self.buffer.extend(ids)
+		return True
+	"""
+		Releases the de-duplication index once no more phrases are to be added
+	"""
+	def close(self):
+		self.index = set()
+	"""
+		Returns the terms of the i-th phrase
+	"""
+	def terms(self,i):
+		return self.vocab.decode(self[i])
+
+"""
+	The histogram keeps track of phrase lengths while the bags are being organized,
+	it is what learners use to select the n-gram sizes they learn from (no need to go over the bags again)
+"""
+class Histogram:
+	def __init__(self):
+		self.count	= {}	#-- number of phrases of a given length
+		self.distinct	= {}	#-- number of distinct phrases of a given length
+	"""
+		@param size	length of the phrase
+		@param new	whether the phrase had not been seen before
+	"""
+	def add(self,size,new=True):
+		self.count[size] = self.count.get(size,0) + 1
+		if new :
+			self.distinct[size] = self.distinct.get(size,0) + 1
+	"""
+		Returns the n-gram sizes ordered by the number of distinct phrases they hold
+
+		@param minimum	smallest n-gram size to be considered
+		@param top	maximum number of sizes to return
+	"""
+	def sizes(self,minimum=3,top=None):
+		ids = [id for id in self.distinct if id >= minimum]
+		ids.sort(key=lambda id: (-self.distinct[id],id))
+		return ids if top is None else ids[:top]
+	"""
+		Returns the most represented n-gram size
+	"""
+	def mode(self,minimum=3):
+		ids = self.sizes(minimum,1)
+		return ids[0] if ids else None
 
 class ILearnContext(Thread):
 	
@@ -55,43 +174,70 @@ class ILearnContext(Thread):
 	"""
 	def __init__(self,sample,field):
 		Thread.__init__(self)
+		self.lock = RLock()
+		self.vocab = Vocabulary()
 		self.bags = {}
 		self.bag_sizes= []
-		self.test = []
+		self.stats = Histogram()
+		self.test = array('i')
+		self.field = field
+		self.sizes = []
+		self.size = None
 		self.organize(sample,field)
 	"""
 		Organizes a given field index into bags of words.
 		The bags of words will serve as basis for generating context (skip-grams)
+		Terms are interned in self.vocab and each bag (keyed by n-gram size) stores its phrases as ids
 
 		@param sample   sample data from which learning is performed
 		@param field  index of the field we want to extract concepts from
 	"""
 	def organize(self,sample,field) :
-		info = {}
 		for row in sample:
-			value = self.getTerms(row[field])
-			#
-			# @TODO:
-			# The minimum we should be working with are bigrams or tri-grams
-			# 	- bi-grams and above work for names
-			#	- tri-grams and above work for addresses
-			# !!! Find a way to make the inference !!!
-			#
-			if len(value) > 1 :
-				id = str(len(value))
-				if id not in self.bags :
-					self.bags[id] = []
-					self.bag_sizes.append(len(value))
-				if str(value) not in info:
-					self.bags[id].append(value) ;
-				info[str(value)]  = 1
-			else:
-				self.test.append(value)
+			self.add(row[field])
+		self.close()
+	"""
+		Adds the value of the field to the bags of words
+		@param value	field value
+	"""
+	def add(self,value):
+		value = self.getTerms(value)
+		#
+		# @TODO:
+		# The minimum we should be working with are bigrams or tri-grams
+		# 	- bi-grams and above work for names
+		#	- tri-grams and above work for addresses
+		# !!! Find a way to make the inference !!!
+		#
+		if len(value) > 1 :
+			id = len(value)
+			if id not in self.bags :
+				self.bags[id] = Bag(id,self.vocab)
+				self.bag_sizes.append(id)
+			self.stats.add(id,self.bags[id].add(self.vocab.encode(value)))
+		elif len(value) == 1:
+			self.stats.add(1)
+			self.test.append(self.vocab.id(value[0]))
+	"""
+		Closes the bags once all values have been added
+	"""
+	def close(self):
 		#
 		# At this point we have insured that the n-grams don't have duplicates
 		# Duplicate data provides very little context for learning
 		#
-		del info
+		[bag.close() for bag in self.bags.values()]
+	"""
+		Selects the n-gram sizes to learn from
+		We use a basic statistical aproach to achieve (Central Limit Theorem)
+
+		@param sizes	number of n-gram sizes to learn from (the most represented ones) or an explicit list of sizes
+	"""
+	def select(self,sizes=1):
+		if isinstance(sizes,int):
+			sizes = self.stats.sizes(3,sizes)
+		self.sizes = [size for size in sizes if size in self.bags]
+		self.size = self.sizes[0] if self.sizes else None
 
 	"""
 		This function expands a field value into it's various terms
@@ -104,12 +250,15 @@ class ILearnContext(Thread):
 		return value
 
 	"""
-		Builds and returns context (skip-grams) given the size of the n-grams
+		Builds context given the size of the n-grams: the phrases of the bag are handed out in chunks of
+		phrase indexes, the plugins read the phrases from the bag and derive their context (skip-grams) as
+		they compare them (see Clean.run) so that nothing is built that wouldn't be used
 
 		@pre size 	in self.bag_sizes
 		@param size	n-gram size 
+		@param chunk	number of phrases per chunk
 	"""
-	def build(self,size):
+	def build(self,size,chunk=256):
 		#
 		# The selected field is broken and grouped into feature size 
 		# Selecting a feature size will give access to the records that match that criteria
@@ -117,91 +266,81 @@ class ILearnContext(Thread):
 		# @TODO:
 		#	- have a learning algorithm that can determine these sizes given the Central Limit Theorem
 		#
-		keys = self.bags.keys() ;
-		id = [key for key in keys if int(key) == size]
-		id = id[0]
-		corpus 	= self.bags[id]
-		context = []
-		MIN_TERMS = 2
-		for phrase in corpus:
-			if len(phrase) > MIN_TERMS:
-				context.append([[term for term in phrase if term!= word] for word in phrase])
-			else:
-			#
-			# Phrases that do not meet the basic context modeling requirements
-			# Will be processed differently, but must still be accounted for
-			#
-				context.append([phrase])
-		return context
+		N = len(self.bags[size])
+		for i in range(0,N,chunk):
+			yield range(i,min(i+chunk,N))
 """
     This class is designed to perform simple context learning i.e using the skip grams
     It is designed for very restricted domain of application
 """
 class SimpleContextLearner(ILearnContext):
-    def __init__(self,sample,field):
-        ILearnContext.__init__(self,sample,field) ;
-        #
-        # We need to determine the best size of contexts from which we can learn
-        # We use a basic statistical aproach to achieve (Central Limit Theorem)
-	#
-        ii = [ len(self.bags[id]) for id in self.bags.keys() if int(id) > 2]
-	id = self.bags.keys()[ii.index(np.max(ii))]
-	self.size = int(id) ;
+	"""
+		@param sizes	number of n-gram sizes to learn from (the most represented ones) or an explicit list of sizes
+	"""
+	def __init__(self,sample,field,sizes=1):
+		ILearnContext.__init__(self,sample,field) ;
+		#
+		# We need to determine the best size of contexts from which we can learn
+		#
+		self.select(sizes)
+	
 	
-    
-    def run(self):
-        context = self.build(self.size)
-        bag = self.bags[str(self.size)]
-	N = len(context) #-- same as in bag
-	NUMBER_THREADS = 2
-	offset = int(N/NUMBER_THREADS)
+	def run(self):
+		load()
+		NUMBER_THREADS = 2
 
-	#
-	# We launch NUMBER_THREADS to learn in parrallel
-	# The results learnt will be accumulated in python Queue
-	# NOTE: duplicates have been removed, so there is no need to consolidate results
+		#
+		# We launch NUMBER_THREADS per n-gram size to learn in parrallel
+		# The context is streamed to the threads in chunks through a bounded queue, so it is never held in memory as a whole
+		# The results learnt will be accumulated in python Queue and are reported as they come
+		# NOTE: duplicates have been removed, so there is no need to consolidate results
+		#
+		self.queue = Queue()
+		threads = []
+		for size in self.sizes:
+			chunks = Queue(2*NUMBER_THREADS)
+			for i in range(0,NUMBER_THREADS):
+				thread = Clean(chunks,self.bags[size]);
+				thread.name = '-'.join([str(size),str(i)])
+				threads.append(thread)
+				thread.init(self.queue,self.lock)
+				thread.start()
+			#
+			# The producer must not keep the process alive should the plugins be gone (see feed)
+			#
+			producer = Thread(target=self.feed,args=(size,chunks,threads[-NUMBER_THREADS:]))
+			producer.daemon = True
+			producer.start()
+		while True:
+			alive = [thread for thread in threads if thread.is_alive()]
+			try:
+				print(self.queue.get(timeout=0.1))
+			except Empty:
+				if len(alive) == 0:
+					break
+	"""
+		Streams the context of a given n-gram size to the plugins
 
-	#	
-	
-	self.queue = Queue()
-	q = []
-	threads = []
-	lock = RLock()
-	for i in range(0,NUMBER_THREADS):
-		xi = i * offset
-		yi = i * offset + offset
-		if i == NUMBER_THREADS-1:
-			yi = N
-		print [xi,yi,(yi-xi)]
-		thread = Clean( list(context[xi:yi]),bag);
-		thread.name = str(i)
-		threads.append(thread)
-		thread.init(self.queue,lock)
-		#thread.setDaemon(True)
-		thread.start()
-	for thread in threads:
-		
-		thread.join()
-		
-		
-		if  np.sum([int(thread.isAlive() == False)for thread in threads]) == len(threads):
-			break	
-	#	if thread.isAlive() == False:
-	#		[q.append(thread.info[value]) for value in thread.info]
-	#		id = thread.info.keys()[0]
-	#		print ['thread - ',thread.name,id,thread.info[id]]	
+		@param size	n-gram size
+		@param chunks	queue shared by the plugins
+		@param plugins	plugins consuming the queue, the feed stops once none of them is alive (a plugin may fail)
+	"""
+	def feed(self,size,chunks,plugins):
+		for chunk in chain(self.build(size),[None]*len(plugins)):
+			while True:
+				try:
+					chunks.put(chunk,timeout=0.1)
+					break
+				except Full:
+					if not any([plugin.is_alive() for plugin in plugins]):
+						return
 	
-	while self.queue.empty() == False:
-		print self.queue.get()
-	#for row in q:
-	#	print row
-		
 	
 """
-	The plugins determine the context-based operation to be undertaken:
-		- cleansing data
-		- concept mining
-		- ...
+		The plugins determine the context-based operation to be undertaken:
+			- cleansing data
+			- concept mining
+			- ...
 """
 class Plugin(Thread):
 	def __init__(self,context,bag):
@@ -217,33 +356,52 @@ class Plugin(Thread):
 	def init(self,queue,lock):
 		self.queue = queue
 		self.lock = lock 
+	"""
+		Returns the chunks of context to be processed, the context is either an iterable of chunks (see ILearnContext.build)
+		or a queue shared with other plugins in which case None signals the end of the stream
+	"""
+	def chunks(self):
+		if isinstance(self.context,Queue):
+			while True:
+				chunk = self.context.get()
+				if chunk is None:
+					break
+				yield chunk
+		else:
+			for chunk in self.context:
+				yield chunk
 class ICleanse(ILearnContext):
-	def __init__(self,sample,field):
-	        ILearnContext.__init__(self,sample,field) ;
+	"""
+		@param sizes	number of n-gram sizes to learn from (the most represented ones) or an explicit list of sizes
+	"""
+	def __init__(self,sample,field,sizes=1):
+		ILearnContext.__init__(self,sample,field) ;
+		self.threads = {}
 		#
 		# We need to determine the best size of contexts from which we can learn
-		# We use a basic statistical aproach to achieve (Central Limit Theorem)
 		#
-		ii = [ len(self.bags[id]) for id in self.bags.keys() if int(id) > 2]
-		self.id = self.bags.keys()[ii.index(np.max(ii))]
-		self.size = int(self.id) ;
-		self.threads = {}
-		self.corpus = self.bags[self.id]
-		self.info = {}
+		self.select(sizes)
+	def select(self,sizes=1):
+		ILearnContext.select(self,sizes)
+		self.id = self.size
+		self.corpus = self.bags[self.id] if self.id is not None else []
+		self.info = {size:{} for size in self.sizes}	#-- findings per n-gram size
 	#
 	# phrase
-	def map(self,phrase):
+	def map(self,phrase,size=None):
+		size = self.size if size is None else size
 		for term in phrase:
 			if len(term) > 4:
 				continue
-			for word in self.corpus:
-				z = Set(term) & Set(word)
+			for word in self.bags[size]:
+				word = self.vocab.decode(word)
+				z = set(term) & set(word)
 				
 				matches = []
 				if len(z) > 0 and len(z) < len(term):
 					#
 					#
-					g=NGram(z - Set(term))
+					g=NGram(z - set(term))
 					#matches = g.search(term)
 				else:
 					#
@@ -258,19 +416,19 @@ class ICleanse(ILearnContext):
 				value = None					
 				if len(matches) > 0:
 					matches = list(matches[0])
-					Pz_ = len(matches) / self.size
+					Pz_ = len(matches) / size
 					Px_ = fuzz.ratio(term,matches[0]) / 100
 					if Px_ > 0.5 and len(term) < len(matches[0]) and len(matches[0]) >= 4:
 						key = term
 						value= {}
 						value= [matches[0],Pz_,Px_,1]
-						self.emit (key,value)
+						self.emit (key,value,size)
 
 	
 	def reduce(self,key,values):
 	
-		N =  np.sum([values[id][2] for id in values]);
-		MaxContext = np.max([ values[id][0] for id in values])
+		N =  sum([values[id][2] for id in values]);
+		MaxContext = max([ values[id][0] for id in values])
 		r = []
 		for id in values:
 			row = values[id]
@@ -281,47 +439,51 @@ class ICleanse(ILearnContext):
 		#N = np.sum([row[2] for row in values])
 		#return [row for row in values if row[2]/N > 0.5]
 		
-	def emit(self,key,value):
-		if key not in self.info:
-			self.info[key] = {}
+	def emit(self,key,value,size=None):
+		info = self.info[self.size if size is None else size]
+		if key not in info:
+			info[key] = {}
 		id = str(value[0])
 		del value[0]
-		if id not in self.info[key]:
-			self.info[key][id] = value
+		if id not in info[key]:
+			info[key][id] = value
 		else:
 			#
 			# updating our findings ...
 			#
-			row = self.info[key][id]
+			row = info[key][id]
 			for i in range(0,len(value) -1) :
 				if value[i] > row[i]:
 					row[i] = value[i]
 					
 			row[2] = 1 + row[2]
-			self.info[key][id] = row
+			info[key][id] = row
 				
 		
 		
 		
+	"""
+		Maps the phrases of a given n-gram size, every size is learnt by its own thread
+		@param size	n-gram size
+	"""
+	def learn(self,size):
+		corpus = self.bags[size]
+		N = min(750,len(corpus)); #len(corpus)
+		[self.map(corpus.terms(i),size) for i in range(0,N)]
+
 	def run(self):
 		#context = self.build(self.size)
-		N = 750; #len(self.corpus)
-		#self.map(self.corpus[190])
-		[self.map(self.corpus[i]) for i in range(0,N)]
-		#[self.map(ngrams) for ngrams in context ]
-		for key in self.info:
-			
-			
-			value = self.info[key]			
-			r =  self.reduce(key,value)
-			if len(r) > 0:
-				print r
-			
-					
-		
-		#print key
-		#print value
-		#print next(self.reduce(key,value))
+		load()
+		for size in self.sizes:
+			self.threads[size] = Thread(target=self.learn,args=(size,))
+			self.threads[size].start()
+		[thread.join() for thread in self.threads.values()]
+		for size in self.sizes:
+			for key in self.info[size]:
+				value = self.info[size][key]
+				r =  self.reduce(key,value)
+				if len(r) > 0:
+					print(r)
 		
 		
 """
@@ -336,77 +498,164 @@ class Clean(Plugin):
 		Plugin.__init__(self,context,bag) ;
 		self.info = {}
 	"""
-		@pre len(context) == len(bag)
+		The context is consumed chunk by chunk (see Plugin.chunks), a chunk holds indexes of phrases of the bag
+		The phrases are compared with their term ids, terms are only decoded for fuzzy matching
+		The phrases of the bag are slices (memoryview) of its buffer: phrase i is only read once and
+		the phrases it is compared with are not copied (no tuple is built for a phrase without common terms)
 	"""
 	def run(self):
-		N = len(self.context)
+		load()
+		vocab = self.bag.vocab
+		width = self.bag.size
+		view = memoryview(self.bag.buffer)	#-- the bag is closed, its buffer doesn't change
 		
 		imatches = []
 		found = {}
 		Y = range(0,len(self.bag))
-		for i in range(0,N):
-			Xo_ = list(self.bag[i])	# skip_gram
-			#Y = (Set(range(0,N)) - (Set([i]) | Set(imatches)))
-			for ii in Y:
-				if self.bag[i] == self.bag[ii] :
-					imatches.append(ii) ;
-					continue
-				#
-				# We are sure we are not comparing the identical phrase
-				# NOTE: Repetition doesn't yield learning, rather context does.
-				# Lets determine if there are common terms
-				#
-				Z = Set(self.bag[i]) & Set(self.bag[ii])
+		for chunk in self.chunks():
+			learnt = set()
+			for i in chunk:
+				X = self.bag[i]
+				Xs = set(X)
+				Xo_ = list(X)	# skip_gram
+				#Y = (set(range(0,N)) - (set([i]) | set(imatches)))
+				for ii in Y:
+					phrase = view[ii*width:(ii+1)*width]
+					#
+					# Lets determine if there are common terms, most phrases have none
+					#
+					if Xs.isdisjoint(phrase):
+						continue
+					phrase = tuple(phrase)
+					if phrase == X :
+						imatches.append(ii) ;
+						continue
+					#
+					# We are sure we are not comparing the identical phrase
+					# NOTE: Repetition doesn't yield learning, rather context does.
+					#
+					Z = Xs.intersection(phrase)
 				
-				if len(Z) > 0 and len(Xo_) > 0:
-
-					Xo_ 	= Set(Xo_) - Z # - list(Set(bag[i]) - Set(bag[ii]))
-					Yo_ 	= Set(self.bag[ii]) - Z #list(Set(bag[ii]) - Set(bag[i]))
-					size 	= len(Xo_)
-					g = NGram(Yo_)	
-					for term in Xo_:
-						
-						xo = g.search(term)
-						if len(xo) > 0 and len(term) < 4:
-							xo = xo[0]
-						else:
-							continue;
-						xo = list(xo)
-						xo_i = self.bag[i].index(term) 
-						yo_i = self.bag[ii].index(xo[0])
-						#
-						# We have the pair, and we will compute the distance
-						#
-						ratio = fuzz.ratio(term,xo[0])/100
-						is_subset = len(Set(term) & Set(xo[0])) == len(term)
-						if is_subset and len(term) < len(xo[0]) and ratio > 0.5 and xo_i ==yo_i:
-							
-							xo[1] = [ratio,xo_i]
-							if (term not in self.info):
-								#xo[1] = ratio
-								self.info[term] = [term,xo[0]]+xo[1]
-							elif term in self.info and ratio > self.info[term][1] :							
-								self.info[term] = [term,xo[0]]+xo[1]
+					if len(Xo_) > 0:
+
+						Xo_ 	= set(Xo_) - Z # - list(set(bag[i]) - set(bag[ii]))
+						Yo_ 	= set(phrase) - Z #list(set(bag[ii]) - set(bag[i]))
+						size 	= len(Xo_)
+						g = NGram(vocab.decode(Yo_))
+						for id in Xo_:
+							term = vocab.terms[id]
+							xo = g.search(term)
+							if len(xo) > 0 and len(term) < 4:
+								xo = xo[0]
+							else:
+								continue;
+							xo = list(xo)
+							xo_i = X.index(id)
+							yo_i = phrase.index(vocab.ids[xo[0]])
+							#
+							# We have the pair, and we will compute the distance
+							#
+							ratio = fuzz.ratio(term,xo[0])/100
+							is_subset = len(set(term) & set(xo[0])) == len(term)
+							if is_subset and len(term) < len(xo[0]) and ratio > 0.5 and xo_i ==yo_i:
 							
+								xo[1] = [ratio,xo_i]
+								if (term not in self.info):
+									#xo[1] = ratio
+									self.info[term] = [term,xo[0]]+xo[1]
+								elif term in self.info and ratio > self.info[term][2] :							
+									self.info[term] = [term,xo[0]]+xo[1]
 							
-							imatches.append(ii)
-							break;
-		#
-		# At this point we consolidate all that has been learnt
-		# And make it available to the outside word, otherwise client should retrieve it
-		#
+								learnt.add(term)
+								imatches.append(ii)
+								break;
+			#
+			# What has been learnt from the chunk is made available right away
+			#
+			self.publish(learnt)
+
+	"""
+		Makes findings available to the outside world, otherwise client should retrieve them (self.info)
+		@param terms	terms whose findings are to be published
+	"""
+	def publish(self,terms):
+		if self.queue is None:
+			return
 		self.lock.acquire()
-		if self.queue is not None:
-			
-			for term in self.info:	
-				value = ['thread # ',self.name]+list(self.info[term])							
-				self.queue.put(value)
+		for term in terms:
+			value = ['thread # ',self.name]+list(self.info[term])
+			self.queue.put(value)
 		self.lock.release()
-				
-			
-			
-				#print term, self.info[term]	
-f = open('/Users/steve/Downloads/data/Accreditation_2015_12/Accreditation_2015_12.csv','rU')
-data = [line.split(',') for line in f]
-thread = ICleanse(data,2)
-thread.start()
+
+"""
+	This class learns the context of several fields at once: the sample is gone over a single time,
+	every field has its own bags (learner) and the learners are then run concurrently
+
+	@param sample	sample records (dataset from csv file for example)
+	@param fields	list of field indexes
+	@param learner	learner class (ICleanse or SimpleContextLearner)
+	@param sizes	number of n-gram sizes to learn from
+"""
+class MultiContextLearner(Thread):
+	def __init__(self,sample,fields,learner=None,sizes=1):
+		Thread.__init__(self)
+		if learner is None:
+			learner = ICleanse
+		self.fields	= list(fields)
+		self.learners	= {field:learner([],field,sizes) for field in self.fields}
+		for row in sample:
+			for field in self.fields:
+				if field < len(row):
+					self.learners[field].add(row[field])
+		for learner in self.learners.values():
+			learner.close()
+			learner.select(sizes)
+	def run(self):
+		[learner.start() for learner in self.learners.values()]
+		[learner.join() for learner in self.learners.values()]
+
+"""
+	Reads a character delimited file lazily and splits every line into its fields,
+	the learners only go over the records once so there is no need to hold the file in memory
+	Bytes that aren't utf-8 are replaced (as repair does), getTerms drops non-ascii characters
+
+	@param path	path to the file
+	@param xchar	delimiter
+"""
+def read(path,xchar=','):
+	with open(path,'r',encoding='utf-8',errors='replace') as f:
+		for line in f:
+			yield line.split(xchar)
+
+"""
+	Learns the context of a given field (or list of fields) of a character delimited file
+
+	@param path	path to the file
+	@param field	field index or list of field indexes
+	@param xchar	delimiter
+	@param learner	learner class (ICleanse or SimpleContextLearner)
+	@param sizes	number of n-gram sizes to learn from
+"""
+def learn(path,field,xchar=',',learner=None,sizes=1):
+	if learner is None:
+		learner = ICleanse
+	if isinstance(field,list):
+		thread = MultiContextLearner(read(path,xchar),field,learner,sizes)
+	else:
+		thread = learner(read(path,xchar),field,sizes)
+	thread.start()
+	return thread
+
+if __name__ == '__main__':
+	import argparse
+	parser = argparse.ArgumentParser(description='Learns the context of a field in a character delimited file')
+	parser.add_argument('path',help='path to the file')
+	parser.add_argument('field',type=int,nargs='+',help='index of the field(s) to learn from')
+	parser.add_argument('--xchar',default=',',help='delimiter')
+	parser.add_argument('--learner',default='cleanse',choices=['cleanse','simple'])
+	parser.add_argument('--sizes',type=int,default=1,help='number of n-gram sizes to learn from')
+	args = parser.parse_args()
+	learners = {'cleanse':ICleanse,'simple':SimpleContextLearner}
+	field = args.field[0] if len(args.field) == 1 else args.field
+	thread = learn(args.path,field,args.xchar,learners[args.learner],args.sizes)
+	thread.join()
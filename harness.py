@@ -0,0 +1,420 @@
+"""
+Weiyi Xia <xwy0220@gmail.com>
+Steve L. Nyemba<steve@the-phi.com>
+
+This file implements a differential harness: the engines that are optimized
+(Row records, validate fast path, merge solver, batches, shards, follow ...)
+must produce the same passed, fixed & broken records as the reference i.e the
+plain record by record Filter/Repair with the greedy merge (beam=0). The harness:
+	- generates random corrupted inputs (extra delimiters, records split over
+	lines, non-ascii characters, extra whitespaces, blank lines)
+	- runs the reference and every variant on the same inputs with the same
+	findings (model, see repair.learn) and diffs their outputs & counters
+	- shrinks the input of a difference to a minimal one (the header and the
+	fewest records that still differ), it is written to <folder>/failures
+	- times the reference & the variants so that a speedup can be asserted
+
+A variant is a set of options of Filter/Repair and how it is run:
+	options:	options of Filter/Repair
+	rows:		records are Rows (see Filter.ROWS), True by default
+	engine:		single|batch|follow (see execute)
+	modes:		modes the variant applies to, filter & repair by default
+	exact:		the streams must be byte for byte identical, otherwise only the
+			records must be the same (in any order)
+	rates:		corruptions of the input the variant is timed on (see generate)
+	speedup:	minimum ratio of the time of the reference over the variant
+
+In order to execute the program
+
+	python harness.py --mode repair --cases 8 --rows 2000
+
+	from harness import Harness
+	thread = Harness('repair',cases=8)
+	thread.start()
+
+"""
+from __future__ import print_function
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+from threading import Thread
+import repair
+
+NAMES	= ['Smith','Jones','Brown','Lee','Garcia','Miller','Davis','Wilson','Nyemba','Xia']
+CITIES	= ['Nashville','Memphis','Knoxville','Austin','Denver','Chicago','Boston']
+ACCENTS	= [u'café',u'München',u'São Paulo',u'Zürich',u'naïve']
+DELIMITERS = [',','|','\t']	#-- the delimiters SampleBuilder detects
+RATES	= {'delimiter':0.03,'delimiters':0.005,'newline':0.02,'accent':0.01,'space':0.01,'empty':0.02,'blank':0.002}
+STREAMS	= ['passed','fixed','broken']
+VARIANTS = {
+	'reference':	{'options':{'validate':False,'beam':0},'rows':False},
+	'solver':	{'options':{'validate':False},'modes':['repair'],'exact':False},
+	'rows':		{'options':{'validate':False,'beam':0},'speedup':1.0},
+	'validate':	{'options':{'validate':True,'beam':0},'rates':{},'speedup':1.0},
+	'checkpoint':	{'options':{'checkpoint':50,'beam':0}},
+	'order':	{'options':{'order':True,'profile':True,'beam':0}},
+	'shard':	{'options':{'shard':{'rows':250,'workers':2},'beam':0}},
+	'batch':	{'options':{'beam':0},'engine':'batch'},
+	'follow':	{'options':{'beam':0},'engine':'follow','modes':['repair'],'exact':False}
+}
+
+"""
+
+This function writes a random delimited file with corrupted records and returns
+the number of records of every corruption
+
+@param:
+	path:	path of the file
+	rows:	number of records (header excluded)
+	seed:	seed of the random generator
+	xchar:	delimiter
+	rates:	{corruption:probability of a record} (see RATES)
+
+"""
+def generate(path,rows=1000,seed=0,xchar=',',rates=None):
+	rates	= RATES if rates is None else rates
+	handle	= random.Random(seed)
+	counts	= {id:0 for id in rates}
+	lines	= [xchar.join(['id','name','age','score','date','city','zip','active'])]
+	for i in range(0,rows):
+		row = [str(i),handle.choice(NAMES),str(handle.randint(18,90)),'%.2f' % handle.uniform(0,100),
+			'2016-%02d-%02d' % (handle.randint(1,12),handle.randint(1,28)),handle.choice(CITIES),
+			'%05d' % handle.randint(10000,99999),handle.choice(['true','false'])]
+		draw = handle.random()
+		id = None
+		for key in rates:
+			if draw < rates[key]:
+				id = key
+				break
+			draw -= rates[key]
+		if id is not None:
+			counts[id] += 1
+		if id == 'delimiter':
+			k = handle.choice([1,5])
+			row[k] = row[k] + xchar + handle.choice([' Jr','Sr',' III','TN'])
+		elif id == 'delimiters':
+			#
+			# A free text field with many delimiters (beyond the budget of the merge solver)
+			#
+			row[1] = (xchar + ' ').join([handle.choice(NAMES) for k in range(0,handle.randint(3,12))])
+		elif id == 'accent':
+			row[5] = row[5] + ' ' + handle.choice(ACCENTS)
+		elif id == 'space':
+			k = handle.randint(1,len(row)-1)
+			row[k] = handle.choice(['  ',' ','']) + row[k][:1] + handle.choice(['  ','']) + row[k][1:] + handle.choice(['  ',' ',''])
+		elif id == 'empty':
+			row[handle.randint(2,len(row)-1)] = ''
+		elif id == 'blank':
+			lines.append('')
+		if id == 'newline':
+			#
+			# The record is split at one or two of its delimiters
+			#
+			cuts = sorted(handle.sample(range(1,len(row)),handle.choice([1,1,2])))
+			cuts = [0] + cuts + [len(row)]
+			lines += [xchar.join(row[cuts[k]:cuts[k+1]]) for k in range(0,len(cuts)-1)]
+		else:
+			lines.append(xchar.join(row))
+	f = open(path,'w',encoding='utf-8')
+	f.write('\n'.join(lines)+'\n')
+	f.close()
+	return counts
+
+"""
+
+This function returns the passed, fixed & broken streams of a job, the parts of
+a sharded stream are put back together (in the order they were written)
+
+"""
+def outputs(folder,name):
+	r = {}
+	stem,ext = os.path.splitext(name)
+	for id in STREAMS + ['ordered']:
+		paths = [os.sep.join([folder,id,name])]
+		n = 0
+		while os.path.exists(os.sep.join([folder,id,'%s.%05d%s' % (stem,n,ext)])):
+			paths.append(os.sep.join([folder,id,'%s.%05d%s' % (stem,n,ext)]))
+			n += 1
+		paths = [path for path in paths if os.path.exists(path)]
+		if len(paths) > 0:
+			r[id] = b''.join([open(path,'rb').read() for path in paths])
+	return r
+
+"""
+
+This function runs a variant on a file and returns its counters, its streams and
+the time it took (the engine's output is not echoed)
+
+@param:
+	path:	path of the input
+	folder:	output folder (emptied)
+	mode:	filter|repair
+	variant:variant (see VARIANTS)
+	model:	findings the engine is given (see repair.learn), a batch learns its own
+
+"""
+def execute(path,folder,mode,variant,model=None):
+	if os.path.exists(folder):
+		shutil.rmtree(folder)
+	os.makedirs(folder)
+	options	= dict(variant.get('options',{}))
+	engine	= repair.Repair if mode == 'repair' else repair.Filter
+	if mode != 'repair':
+		[options.pop(id,None) for id in ['beam','budget']]	#-- options of the merge (see Repair)
+	rows	= repair.Filter.ROWS
+	repair.Filter.ROWS = variant.get('rows',True)
+	try:
+		with contextlib.redirect_stdout(io.StringIO()):
+			started = time.perf_counter()
+			if variant.get('engine','single') == 'batch':
+				thread = repair.Batch(path,folder,mode,1,**options)
+				thread.run()
+				if len(thread.summary['errors']) > 0:
+					raise RuntimeError(list(thread.summary['errors'].values())[0])
+				summary = thread.summary['reports'][0]
+			elif variant.get('engine','single') == 'follow':
+				summary = follow(path,folder,mode,options,model)
+			else:
+				thread = engine(path,folder,model=model,**options)
+				thread.run()
+				summary = thread.summary
+			elapsed = time.perf_counter() - started
+	finally:
+		repair.Filter.ROWS = rows
+	return summary['counts'],outputs(folder,os.path.basename(path)),elapsed
+
+"""
+
+This function follows a copy of a file that is written in parts (cut anywhere,
+lines included) and polled after every part, the copy has the name of the file
+
+"""
+def follow(path,folder,mode,options,model,chunks=4):
+	data	= open(path,'rb').read()
+	target	= os.sep.join([folder,'input',os.path.basename(path)])
+	os.makedirs(os.path.dirname(target))
+	handle	= random.Random(len(data))
+	cuts	= sorted(handle.sample(range(1,len(data)),min(chunks-1,max(0,len(data)-1)))) + [len(data)]
+	f = open(target,'wb')
+	f.write(data[:cuts[0]])
+	f.close()
+	options.update({'interval':0,'polls':0,'model':model})
+	thread = repair.Follow(target,folder,**options) if mode == 'repair' else None
+	if thread is None:
+		raise ValueError('only repairs can be followed')
+	thread.poll()
+	for k in range(1,len(cuts)):
+		f = open(target,'ab')
+		f.write(data[cuts[k-1]:cuts[k]])
+		f.close()
+		thread.poll()
+	thread.run()
+	return thread.summary
+
+"""
+
+This function returns the differences between the results of two engines
+(see execute): counters and streams, a stream that isn't the same byte for byte
+is reported with the records missing/extra (the first few of them) or as
+reordered if it has the same records
+
+@param:
+	exact:	the streams must be identical, otherwise the records in any order
+
+"""
+def compare(a,b,exact=True,show=5):
+	differences = []
+	if a[0] != b[0]:
+		differences.append({'stream':'counts','reference':a[0],'variant':b[0]})
+	for id in STREAMS:
+		x,y = a[1].get(id,b''),b[1].get(id,b'')
+		if x == y:
+			continue
+		x,y = Counter(x.splitlines(True)),Counter(y.splitlines(True))
+		if x == y:
+			if exact:
+				differences.append({'stream':id,'reordered':True})
+			continue
+		missing	= [line.decode('utf-8','replace') for line in list((x - y).elements())[:show]]
+		extra	= [line.decode('utf-8','replace') for line in list((y - x).elements())[:show]]
+		differences.append({'stream':id,'missing':missing,'extra':extra})
+	return differences
+
+"""
+
+This class is designed to run the reference and the variants on random corrupted
+inputs, to shrink the inputs they differ on and to time them. The report is kept
+in summary and written to <folder>/harness.json, ok is False if a variant
+differs, fails or isn't as fast as it is expected to be
+
+"""
+class Harness(Thread):
+	"""
+
+	@param:
+		mode:		filter|repair
+		variants:	{name:variant} (see VARIANTS), the reference is VARIANTS['reference'] unless given
+		cases:		number of random inputs
+		rows:		number of records of an input
+		seed:		seed of the inputs (case i has seed + i)
+		folder:		work folder (a temporary folder by default)
+		repeat:		number of times the engines are timed (the best time is kept)
+		shrink:		shrink the inputs variants differ on
+		tries:		maximum number of runs to shrink an input
+
+	"""
+	def __init__(self,mode='repair',variants=None,cases=8,rows=2000,seed=0,folder=None,repeat=3,shrink=True,tries=256):
+		Thread.__init__(self)
+		self.mode	= mode
+		self.variants	= dict(variants if variants is not None else VARIANTS)
+		self.reference	= self.variants.pop('reference',VARIANTS['reference'])
+		self.cases	= cases
+		self.rows	= rows
+		self.seed	= seed
+		self.folder	= folder if folder is not None else tempfile.mkdtemp(prefix='harness-')
+		self.repeat	= repeat
+		self.shrinking	= shrink
+		self.tries	= tries
+		self.summary	= None
+		self.variants	= {name:variant for name,variant in self.variants.items() if mode in variant.get('modes',['filter','repair'])}
+	"""
+
+	This function returns the findings the engines of a variant are given on an
+	input, a batch learns its own and so does the reference it is compared to
+
+	"""
+	def model(self,path,variant):
+		return None if variant.get('engine') == 'batch' else repair.learn(path,self.mode)
+	"""
+
+	This function runs the reference & a variant on an input and returns their differences
+
+	"""
+	def differ(self,path,name,variant,model):
+		folder = os.sep.join([self.folder,'runs'])
+		try:
+			a = execute(path,os.sep.join([folder,'reference']),self.mode,self.reference,model)
+		except Exception as e:
+			return [{'stream':'reference','error':repr(e)}]
+		try:
+			b = execute(path,os.sep.join([folder,name]),self.mode,variant,model)
+		except Exception as e:
+			return [{'stream':'variant','error':repr(e)}]
+		return compare(a,b,variant.get('exact',True))
+	"""
+
+	This function shrinks an input that a variant differs on (delta debugging over
+	the records, the header is kept): chunks of records are removed as long as
+	the variant still differs, with the findings of the original input so that
+	the delimiter & the inspectors don't change as records are removed
+
+	"""
+	def shrink(self,path,name,variant,model):
+		lines	= open(path,'rb').read().splitlines(True)
+		header,lines = lines[:1],lines[1:]
+		target	= os.sep.join([self.folder,'shrink',os.path.basename(path)])
+		if os.path.exists(os.path.dirname(target)) == False:
+			os.makedirs(os.path.dirname(target))
+		tries	= [0]
+		def fails(candidate):
+			if tries[0] >= self.tries:
+				return False
+			tries[0] += 1
+			f = open(target,'wb')
+			f.write(b''.join(header + candidate))
+			f.close()
+			return len(self.differ(target,name,variant,model)) > 0
+		n = 2
+		while len(lines) >= 2 and tries[0] < self.tries:
+			size = int(len(lines) / n)
+			removed = False
+			for i in range(0,n):
+				candidate = lines[:i*size] + lines[(i+1)*size if i < n - 1 else len(lines):]
+				if len(candidate) > 0 and fails(candidate):
+					lines,n,removed = candidate,max(n - 1,2),True
+					break
+			if removed == False:
+				if n >= len(lines):
+					break
+				n = min(len(lines),n * 2)
+		return [line.decode('utf-8','replace') for line in header + lines],tries[0]
+	"""
+
+	This function times the reference & a variant on an input and returns the
+	best of their times
+
+	"""
+	def time(self,name,variant):
+		path = os.sep.join([self.folder,'inputs','timing-%s.csv' % name])
+		generate(path,self.rows * 5,self.seed,',',variant.get('rates'))
+		model = self.model(path,variant)
+		times = []
+		for id,engine in [('reference',self.reference),(name,variant)]:
+			folder = os.sep.join([self.folder,'runs',id])
+			times.append(min([execute(path,folder,self.mode,engine,model)[2] for i in range(0,self.repeat)]))
+		return times
+	def run(self):
+		started = time.time()
+		os.makedirs(os.sep.join([self.folder,'inputs']),exist_ok=True)
+		inputs = []
+		for i in range(0,self.cases):
+			seed	= self.seed + i
+			xchar	= DELIMITERS[i % len(DELIMITERS)]
+			path	= os.sep.join([self.folder,'inputs','case-%d.csv' % seed])
+			counts	= generate(path,self.rows,seed,xchar)
+			inputs.append({'path':path,'seed':seed,'xchar':xchar,'corruptions':counts})
+		results = {}
+		ok = True
+		for name,variant in self.variants.items():
+			failures = []
+			for info in inputs:
+				model = self.model(info['path'],variant)
+				differences = self.differ(info['path'],name,variant,model)
+				if len(differences) == 0:
+					continue
+				failure = {'case':info['seed'],'differences':differences}
+				if self.shrinking:
+					failure['input'],failure['tries'] = self.shrink(info['path'],name,variant,model)
+					failure['differences'] = self.differ(os.sep.join([self.folder,'shrink',os.path.basename(info['path'])]),name,variant,model) or differences
+					folder = os.sep.join([self.folder,'failures'])
+					os.makedirs(folder,exist_ok=True)
+					f = open(os.sep.join([folder,'%s-%d.csv' % (name,info['seed'])]),'w',encoding='utf-8')
+					f.write(''.join(failure['input']))
+					f.close()
+				failures.append(failure)
+			reference,elapsed = self.time(name,variant) if self.repeat > 0 else (None,None)
+			speedup = reference / elapsed if elapsed else None
+			passed = len(failures) == 0 and (speedup is None or 'speedup' not in variant or speedup >= variant['speedup'])
+			results[name] = {'failures':failures,'reference':reference,'time':elapsed,'speedup':speedup,'expected':variant.get('speedup'),'ok':passed}
+			ok = ok and passed
+		self.summary = {'mode':self.mode,'cases':inputs,'variants':results,'ok':ok,'elapsed':time.time() - started}
+		f = open(os.sep.join([self.folder,'harness.json']),'w')
+		json.dump(self.summary,f,indent=1)
+		f.close()
+
+if __name__ == '__main__':
+	import argparse
+	import sys
+	parser = argparse.ArgumentParser(description='Runs optimized engines against the reference Filter/Repair on random corrupted inputs')
+	parser.add_argument('--mode',default='repair',choices=['repair','filter'])
+	parser.add_argument('--variants',nargs='*',default=None,help='variants to run (see VARIANTS), all by default')
+	parser.add_argument('--cases',type=int,default=8)
+	parser.add_argument('--rows',type=int,default=2000)
+	parser.add_argument('--seed',type=int,default=0)
+	parser.add_argument('--folder',default=None,help='work folder (inputs, outputs, failures & harness.json)')
+	parser.add_argument('--repeat',type=int,default=3,help='number of times the engines are timed, 0 not to time them')
+	args = parser.parse_args()
+	variants = VARIANTS if args.variants is None else {name:VARIANTS[name] for name in ['reference'] + args.variants}
+	thread = Harness(args.mode,variants,args.cases,args.rows,args.seed,args.folder,args.repeat)
+	thread.run()
+	for name,info in thread.summary['variants'].items():
+		speedup = '' if info['speedup'] is None else ' %.2fx' % info['speedup']
+		print('%-12s %-4s %d failure(s)%s' % (name,'ok' if info['ok'] else 'FAIL',len(info['failures']),speedup))
+	print(thread.folder)
+	sys.exit(0 if thread.summary['ok'] else 1)
@@ -49,13 +49,305 @@ In order to execute the program
 
 """
 
-from __future__ import division
+from __future__ import division, print_function
 import numpy as np
-from threading import Thread
+from threading import Thread, Lock
+from queue import Queue
 import re
 import sys
 import os
 import uuid
+import time
+import json
+import mmap
+import base64
+import struct
+import glob
+import hashlib
+import shutil
+import tempfile
+import zlib
+import math
+import random
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+try:
+	import resource
+except ImportError:
+	resource = None
+
+"""
+
+This class is designed to instrument the stages of a job: sampling, detection
+(delimiter/columns), training (inspectors), filter, merge, aggregate and write.
+Every stage accumulates wall/cpu time, rows and bytes read/written, the merge
+recursion depth is kept as a histogram. The report is a dictionary that is
+written as JSON to the logs stream.
+
+Profiling (cProfile) of the stages can be switched on/off at runtime, as can the
+instrumentation itself in which case the calls return right away.
+
+@NOTE: cpu time is the cpu time of the process (all threads) during the stage
+
+"""
+class Monitor:
+	def __init__(self,enabled=True,profile=False):
+		self.enabled	= enabled
+		self.stages	= {}
+		self.depth	= {}
+		self.running	= {}
+		self.lock	= Lock()	#-- measurements are added by writer threads as well (see Shards)
+		self.profiler	= None
+		self.profiling	= False	#-- whether the stages are to be profiled (see profile)
+		self.started	= time.time()
+		self.profile(profile)
+	def enable(self,flag=True):
+		self.enabled = flag
+	"""
+
+	This function switches profiling of the stages on or off. It is meant to be
+	called from any thread while a profiler is installed on the thread running the
+	stages (cProfile is per thread): the switch is only recorded, the profiler is
+	installed by start and uninstalled by stop (then dropped if profiling is off)
+
+	"""
+	def profile(self,flag=True):
+		self.profiling = flag
+		if flag and self.profiler is None:
+			import cProfile
+			self.profiler = cProfile.Profile()
+	def start(self,id):
+		if self.enabled == False:
+			return
+		self.running[id] = (time.perf_counter(),time.process_time())
+		if self.profiling and self.profiler is not None:
+			self.profiler.enable()
+	"""
+
+	This function closes a stage opened with start
+
+	@param:
+		id:	stage identifier
+		rows:	number of rows processed during the stage
+		read:	number of bytes read
+		written:number of bytes written
+
+	"""
+	def stop(self,id,rows=0,read=0,written=0):
+		if id not in self.running:
+			return
+		profiler = self.profiler
+		if profiler is not None:
+			profiler.disable()
+			if self.profiling == False and self.profiler is profiler:
+				self.profiler = None
+		wall,cpu = self.running.pop(id)
+		if self.enabled :
+			self.add(id,time.perf_counter()-wall,time.process_time()-cpu,rows,read,written)
+	"""
+
+	This function adds measurements to a stage, it is used by code that times
+	itself (hot path) rather than going through start/stop. It can be called from
+	any thread
+
+	"""
+	def add(self,id,wall=0,cpu=0,rows=0,read=0,written=0):
+		self.lock.acquire()
+		if id not in self.stages:
+			self.stages[id] = {'calls':0,'wall':0,'cpu':0,'rows':0,'bytes_read':0,'bytes_written':0}
+		stage = self.stages[id]
+		stage['calls']		+= 1
+		stage['wall']		+= wall
+		stage['cpu']		+= cpu
+		stage['rows']		+= rows
+		stage['bytes_read']	+= read
+		stage['bytes_written']	+= written
+		self.lock.release()
+	def merge_depth(self,depth):
+		if self.enabled :
+			self.depth[depth] = self.depth.get(depth,0) + 1
+	"""
+
+	This function returns the peak memory (resident set size) of the process in KB
+
+	"""
+	def memory(self):
+		if resource is None:
+			return None
+		peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		return int(peak/1024) if sys.platform == 'darwin' else peak
+	def report(self):
+		stages = {}
+		self.lock.acquire()
+		measured = {id:dict(self.stages[id]) for id in self.stages}
+		self.lock.release()
+		for id in measured:
+			stage = measured[id]
+			stage['rows_per_sec'] = round(stage['rows']/stage['wall'],2) if stage['wall'] > 0 else None
+			stages[id] = stage
+		r = {'elapsed':time.time() - self.started,'peak_memory_kb':self.memory(),'stages':stages,'merge_depth':{str(id):self.depth[id] for id in sorted(self.depth)}}
+		if self.profiling and self.profiler is not None:
+			import pstats
+			p = pstats.Stats(self.profiler)
+			r['profile'] = [ {'function':'%s:%d(%s)' % id,'calls':p.stats[id][1],'tottime':p.stats[id][2],'cumtime':p.stats[id][3]} for id in sorted(p.stats,key=lambda id:-p.stats[id][3])[:20]]
+		return r
+
+"""
+
+This class is designed to infer the type of values & columns on a lattice:
+
+	empty < boolean | int < float | date (format) < categorical < text
+
+The type of a value is found from its shape (digits mapped to 9, letters to a)
+so that all the values of a shape share the same finding, shapes & values are
+cached. A column is typed at once: the shapes of all its values are computed by
+a single table lookup over a buffer of the column (numpy), the distinct shapes
+are then typed and the column takes the most specific type most of its values
+agree with.
+
+"""
+class Types:
+	LIMIT	= 1 << 16	#-- size of the caches
+	BOOLEAN	= set(['true','false','t','f','yes','no','y','n'])
+	DATES	= [('^9{4}-9{1,2}-9{1,2}$','%Y-%m-%d'),('^9{4}/9{1,2}/9{1,2}$','%Y/%m/%d'),('^9{4}-9{2}-9{2}[ T]9{2}:9{2}(:9{2})?$','%Y-%m-%d %H:%M:%S'),
+		('^9{1,2}-9{1,2}-9{4}$','%d-%m-%Y'),('^9{1,2}/9{1,2}/9{4}$','%m/%d/%Y'),('^9{1,2}-9{1,2}-9{2}$','%d-%m-%y'),('^9{1,2}/9{1,2}/9{2}$','%m/%d/%y'),
+		('^9{1,2}-a{3}-9{4}$','%d-%b-%Y'),('^9{1,2}-a{3}-9{2}$','%d-%b-%y'),('^9{1,2} a{3} 9{4}$','%d %b %Y')]
+	def __init__(self):
+		digits,letters = '0123456789','abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+		self.table	= str.maketrans(digits+letters,'9'*len(digits)+'a'*len(letters))
+		self.TABLE	= np.arange(256,dtype=np.uint8)
+		self.TABLE[np.frombuffer(digits.encode('ascii'),dtype=np.uint8)] = ord('9')
+		self.TABLE[np.frombuffer(letters.encode('ascii'),dtype=np.uint8)] = ord('a')
+		self.dates	= [(re.compile(pattern),format) for pattern,format in self.DATES]
+		self.values	= {}	#-- value -> type
+		self.shapes	= {}	#-- shape -> (type,format)
+	"""
+
+	This function returns the type & date format (if any) of a shape, booleans
+	are words and are told apart from text on the value (see kind)
+
+	"""
+	def shape(self,shape):
+		r = self.shapes.get(shape)
+		if r is None:
+			s = shape[1:] if len(shape) > 1 and shape[0] in '+-' else shape
+			if s.strip('9') == '':
+				r = ('int',None)
+			elif len(s) > 1 and s.count('.') == 1 and s.replace('.','').strip('9') == '':
+				r = ('float',None)
+			else:
+				r = ('text',None)
+				for pattern,format in self.dates:
+					if pattern.match(shape) is not None:
+						r = ('date',format)
+						break
+			if len(self.shapes) < self.LIMIT:
+				self.shapes[shape] = r
+		return r
+	"""
+
+	This function returns the type of a value {empty,boolean,int,float,date,text}
+
+	"""
+	def kind(self,value):
+		value = value.strip()
+		r = self.values.get(value)
+		if r is None:
+			if value == '':
+				r = 'empty'
+			else:
+				r = self.shape(value.translate(self.table))[0]
+				if r == 'text' and value.lower() in self.BOOLEAN:
+					r = 'boolean'
+			if len(self.values) < self.LIMIT:
+				self.values[value] = r
+		return r
+	"""
+
+	This function returns the types of values (stripped) at once: their shapes are
+	computed by a single table lookup over a buffer of the values and every
+	distinct shape is typed once (see kind)
+
+	"""
+	def kinds(self,values):
+		if len(values) == 0:
+			return []
+		buffer	= '\n'.join(values).encode('utf-8','replace')
+		shapes	= self.TABLE[np.frombuffer(buffer,dtype=np.uint8)].tobytes().decode('utf-8','replace').split('\n')
+		found	= {shape:self.shape(shape)[0] if shape != '' else 'empty' for shape in set(shapes)}
+		r	= [found[shape] for shape in shapes]
+		if 'text' in found.values():
+			r = [id if id != 'text' or value.lower() not in self.BOOLEAN else 'boolean' for id,value in zip(r,values)]
+		return r
+	"""
+
+	This function types a column (list of values) at once, it returns the type
+	of the column, its date format, categories (categorical) and the number of
+	values of every type
+
+	"""
+	def infer(self,values):
+		values	= [value.strip() for value in values]
+		filled	= [value for value in values if value != '']
+		kinds	= {'empty':len(values) - len(filled)}
+		formats	= {}
+		if len(filled) > 0:
+			buffer	= '\n'.join(filled).encode('utf-8','replace')
+			shapes	= self.TABLE[np.frombuffer(buffer,dtype=np.uint8)].tobytes().decode('utf-8','replace').split('\n')
+			counts	= {}
+			for shape in shapes:
+				counts[shape] = counts.get(shape,0) + 1
+			for shape in counts:
+				id,format = self.shape(shape)
+				kinds[id] = kinds.get(id,0) + counts[shape]
+				if format is not None:
+					formats[format] = formats.get(format,0) + counts[shape]
+			if kinds.get('text',0) > 0:
+				booleans = sum([1 for value in filled if value.lower() in self.BOOLEAN])
+				kinds['text'] -= booleans
+				kinds['boolean'] = booleans
+		distinct = set(filled)
+		return self.resolve(kinds,len(distinct),formats,distinct)
+	"""
+
+	This function returns the type of a column given the number of values of
+	every type (see infer, Profile)
+
+	@param:
+		kinds:		{type:number of values}
+		distinct:	number of distinct values
+		formats:	{date format:number of values}
+		categories:	distinct values (if known)
+
+	"""
+	def resolve(self,kinds,distinct,formats=None,categories=None):
+		n = sum([kinds[id] for id in kinds if id != 'empty'])
+		r = {'type':'empty','format':None,'kinds':kinds}
+		if n == 0:
+			return r
+		p = lambda ids: sum([kinds.get(id,0) for id in ids])/n
+		threshold = 0.5
+		if categories is not None and 0 < len(categories) <= 2 and set([value.lower() for value in categories]) <= self.BOOLEAN | set(['0','1']):
+			r['type'] = 'boolean'
+		elif p(['boolean']) > threshold:
+			r['type'] = 'boolean'
+		elif p(['int','float']) > threshold:
+			r['type'] = 'float' if kinds.get('float',0) > 0 else 'int'
+		elif p(['date']) > threshold:
+			r['type'] = 'date'
+			r['format'] = max(formats,key=lambda id: formats[id]) if formats else None
+		elif distinct <= max(2,0.2*n):
+			r['type'] = 'categorical'
+			if categories is not None:
+				r['categories'] = sorted(categories)
+		else:
+			r['type'] = 'text'
+		return r
+#
+# The type engine is shared so that its caches are (see Inspect, Profile)
+#
+TYPES = Types()
 
 """
 
@@ -94,6 +386,30 @@ class Inspect(Thread):
 		pass
 	"""
 
+	This function inspects several rows at once, it returns a matrix (one
+	row of agreement per row submitted). Sub-classes override it with a
+	vectorized implementation
+
+	@param:
+		rows: list of rows of ncols fields
+
+	"""
+	def evaluate(self,rows):
+		return np.array([self.inspect(row) for row in rows])
+	"""
+
+	These functions export/restore what has been learnt from the sample (the
+	attributes listed in PARAMS) so that a job can resume without training
+
+	"""
+	PARAMS = []
+	def params(self):
+		return {id:np.asarray(getattr(self,id)).tolist() for id in self.PARAMS}
+	def restore(self,params):
+		for id in self.PARAMS:
+			setattr(self,id,np.array(params[id]))
+	"""
+
 	This function is designed to convert the sample into usable format
 	depending on the field inspection method implemented By default it will
 	only return the sample and must be overriden by base classes
@@ -111,6 +427,7 @@ average.
 
 """
 class InspectFieldLength(Inspect):
+	PARAMS = ['mean','var']
 	def __init__(self,sample):
 		Inspect.__init__(self,sample) ;	
 		self.nrows = self.nrows -1 #-- because we skip the header row
@@ -157,6 +474,8 @@ form : in our case every column will be converted into the length
 		values = [ int(row[i] == self.mean[i]) for i in range(0,self.ncols)]
 		#values = [ int(len(row[i].strip())== self.mean[i]) for i in range(0,self.ncols)]
 		return values;
+	def evaluate(self,rows):
+		return (np.array(self.convert(rows)) == np.array(self.mean)).astype(int)
 
 """
 
@@ -165,6 +484,7 @@ having data.
 
 """
 class InspectProbability(Inspect):
+	PARAMS = ['px','px_values']
 	def __init__(self,sample):
 		Inspect.__init__(self,sample) ;	
 		self.nrows = self.nrows -1 #-- because we skip the header row
@@ -201,24 +521,30 @@ class InspectProbability(Inspect):
 	def inspect(self,row):
 		r = self.convert([row])[0]
 		return list(np.multiply(self.px,r))
+	def evaluate(self,rows):
+		return np.multiply(np.array(self.convert(rows)),self.px)
 
 """
 
-This is a base class of determining field types, it is based on regular
-expressions and a computation of probabilities.  Because the computation of
+This is a base class of determining field types, it is based on the type engine
+(see Types) and a computation of probabilities.  Because the computation of
 probabilities and inspection are identical we abstract it in this class. The
-sub-classes will implement identification specifications using regex.
+sub-classes will implement identification specifications as the types (KINDS)
+a field must have.
 
 """
 class InspectFieldType(Inspect):
+	PARAMS = ['px','px_values']
+	KINDS = []
 	def __init__(self,sample):
+		self.values = sample
 		Inspect.__init__(self,sample) ;
 		self.nrows = self.nrows -1 #-- because we skip the header row
 		#self.pattern = None;
 	"""
 
 	This function will convert the sample into a binary stream given a
-	field is numeric or not.
+	field is of the expected types or not (the type of a value is a lookup)
 
 	@param:
 		sample: sample data (matrix)
@@ -226,18 +552,19 @@ class InspectFieldType(Inspect):
 
 	"""
 	def convert(self,sample):
-		pattern = self.getPattern();
-		m = {True:1,False:0}
-		return [[ m[re.match(pattern,col.strip()) is not None] for col in row] for row in sample]
+		kind = TYPES.kind
+		return [[ int(kind(col) in self.KINDS) for col in row] for row in sample]
 
 	def run(self):
 		"""
 
 		We will compute the probability/frequencies found given the data converted
 		the result will be a binary stream that will serve as a basis for assessment
+		The columns of the sample are typed at once (see Types.infer)
 
 		"""
-		self.px_values = np.divide([ np.sum(row) for row in np.array(self.sample[1:]).transpose()],self.nrows)
+		self.types = [TYPES.infer(list(column)) for column in zip(*self.values[1:])]
+		self.px_values = np.divide([ sum([info['kinds'].get(id,0) for id in self.KINDS]) for info in self.types],self.nrows)
 		threshold = 0.5
 		m = {True:1,False:0}
 		self.px = [ m[p > threshold] for p in self.px_values]
@@ -253,42 +580,32 @@ class InspectFieldType(Inspect):
 		row = self.convert([row])[0]
 		m = {True:1,False:0}
 		return [m[row[i] == self.px[i]] for i in range(0,self.ncols)]
+	def evaluate(self,rows):
+		return (np.array(self.convert(rows)) == np.array(self.px)).astype(int)
 		
 """
 
 This class is designed to inspect numeric types, this will include
 integers and doubles
 
-@TODO:
-	We have to write perhaps more specific integer assessment and
-	double assessment to be used.
-
 """
 class InspectNumericField(InspectFieldType):
+	KINDS = ['int','float']
 	def __init__(self,sample):
 		InspectFieldType.__init__(self,sample) ;
-	def getPattern(self):
-		return '^[0-9]{1,}(\x2E[0-9])*$'
 
 """
 
-This class is designed to inspect date types in 3 formats formats
-	yyyy-dd-mm|dd-mm-yyyy|dd-M-yyyy.
+This class is designed to inspect date types in the formats of Types.DATES
+	yyyy-mm-dd|dd-mm-yyyy|mm/dd/yyyy|dd-M-yyyy ...
 The confirmation of data should be enforced by the length. We assume/conjecture
 that a dataset has consistent output when it comes to dates (hopefully)
 
 """
 class InspectDateField(InspectFieldType):
+	KINDS = ['date']
 	def __init__(self,sample):
-		Inspect.__init__(self,sample) ;
-	"""
-
-	This function will return a regex date pattern to be used to identify
-	dates.
-
-	"""
-	def getPattern(self):
-		return '(^\d{1,4}-\d{1,2}-\d{1,2}|^\d{1,2}-\d{1,2}-\d{2,4} | \d{1,2}[A-Z][a-z]-\d{1,4} )'
+		InspectFieldType.__init__(self,sample) ;
 
 		
 """
@@ -303,44 +620,60 @@ Method:
 	- If the first assumption holds we can derive more meaningful
 	statistics from this. 
 
-	@TODO:
-		Incorporate a mechanism like (bootstrap) where various sizes of
-		fractions are tried in order to have confirmation on the basic
-		assumption in order to yield better results
+	- The findings from the head of the file can be confirmed by a bootstrap
+	over random samples of the whole file (see Bootstrap), the consensus then
+	prevails
 
 """
 class SampleBuilder(Thread):
-	def __init__(self,path,size=-1):
+	def __init__(self,path,size=-1,monitor=None,bootstrap=False):
 		Thread.__init__(self)
 		self.xchar = None
 		self.ncols = None
 		self.nrows = None
 		self.FRACTION = 5
-		if os.path.exists(path):
+		self.estimate = None	#-- findings of the bootstrap (see Bootstrap)
+		self.monitor = monitor if monitor is not None else Monitor(False)
+		#
+		# A size of 0 means the caller already has the findings (delimiter, columns & sample), nothing is read
+		#
+		if os.path.exists(path) and size != 0:
 				
 			#
 			# Before we start anything we must have an idea of the number of rows we are dealing with
 			# If the calling code has not given us a viable baseline then we should try to infer one (20% of the file)
 			#
+			self.monitor.start('sampling')
 			if size < 0 :
 				self.row_count(path)
 				size = int(self.nrows/self.FRACTION)
 			
 			sample = self.read(path,size)
+			self.monitor.stop('sampling',len(sample))
 			#
 			# Now that we have been able to determin the number of columns and the delimiter
 			# We should create a viable sample that meets the column/delimiters found requirements
 			#
+			self.monitor.start('detection')
 			self.row_xchar(sample)
 			self.col_count(sample) 
+			self.monitor.stop('detection',len(sample))
+			if bootstrap:
+				self.monitor.start('bootstrap')
+				self.estimate = Bootstrap(path).run()
+				self.monitor.stop('bootstrap',self.estimate['draws']*self.estimate['rows'])
+				if self.estimate['xchar'] is not None:
+					self.xchar,self.ncols = self.estimate['xchar'],self.estimate['ncols']
 			
+			self.monitor.start('sampling')
 			self.sample = self.read(path,size)
+			self.monitor.stop('sampling',len(self.sample))
 			
 		else:
 			pass
 	def row_count (self,path):
 		if self.nrows is None:
-			f = open(path,'rU')
+			f = open(path,'r',errors='replace')
 			self.nrows = np.sum([1 for row in f])
 			f.close()
 		return self.nrows
@@ -358,7 +691,7 @@ class SampleBuilder(Thread):
 
 	"""
 	def read(self,path,size):
-		f = open(path,'rU') ;
+		f = open(path,'r',errors='replace') ;
 		sample = []
 		for row in f:
 			if self.xchar is not None and self.ncols is not None:
@@ -391,8 +724,8 @@ class SampleBuilder(Thread):
 					m[id] = 0
 				m[id] = m[id] + 1
 			
-			index = m.values().index( max(m.values()) )
-			self.ncols = int(m.keys()[index])
+			index = list(m.values()).index( max(m.values()) )
+			self.ncols = int(list(m.keys())[index])
 		
 		
 		return self.ncols;
@@ -435,245 +768,1987 @@ class SampleBuilder(Thread):
 	def row_xchar(self,sample):
 		if self.xchar is None:
 			m = {',':[],'\t':[],'|':[]} 
-			delim = m.keys()
+			delim = list(m.keys())
 			for row in sample:
 				for xchar in delim:
 					m[xchar].append(len(row.split(xchar)))
 			#
-			# The delimiter with the smallest variance, provided the mean is greater than 1
+			# The delimiter with the smallest variance, provided it splits most records (median greater than 1)
 			# This would be troublesome if there many broken records sampled
 			#
-			m = {id: np.var(m[id]) for id in m.keys() if np.mean(m[id])>1}
-			index = m.values().index( min(m.values()))
-			self.xchar = m.keys()[index]
+			m = {id: np.var(m[id]) for id in m.keys() if np.median(m[id])>1}
+			index = list(m.values()).index( min(m.values()))
+			self.xchar = list(m.keys())[index]
 		
 		return self.xchar
 
 """
 
-The output class hierarchy will determine where the content will be sent:
-	- Disk
-	- Cloud dropbox, google-drive, one-drive, s3 , big-table
-	- Queue (rabbitmq)
+This class is designed to confirm the delimiter & the number of columns found
+from the head of a file (bootstrap): samples of lines starting at random byte
+offsets are drawn from the whole file and the detection of SampleBuilder is run
+on every one of them. The draws are made concurrently in rounds, it stops as
+soon as a round agrees with all the previous ones.
+
+The consensus (most frequent finding) is returned with the agreement of the
+draws and its 95% (Wilson) interval, the 95% interval of the number of columns
+and the rate of records with that number of columns
 
 """
-class Output(Thread):
-	def __init__(self,filename,folder):
-		self.filename	= filename ;
-		self.folder	= folder;
-		self.key 	= str(uuid.uuid1())
-	def write(self,line):
-		pass
-class Disk(Output):
-	def __init__(self,filename,folder):
-		Output.__init__(self,filename,folder) ;
-		
-	def init(self):
-		prefix = os.sep.join([self.folder])
-		lfolders =[prefix] + [ os.sep.join([prefix,f]) for f in ['passed','fixed','broken','logs']]
-		self.files = {}
-		for folder in lfolders:
-			if os.path.exists(folder) == False:
-				print folder
-				os.mkdir(folder)
-			if folder != prefix:
-				path = os.sep.join([folder,self.filename])
-				f = open(path,'w') ;
-				f.close()
-				if re.match('^.*fixed.*$',folder) is not None:
-					self.files['fixed'] = path
-				elif re.match('^.*passed.*$',folder) is not None:
-					self.files['passed'] = path
-				elif re.match('^.*broken.*$',folder) is not None:
-					self.files['broken'] = path
-				elif re.match('^.*logs.*$',folder) is not None:
-					self.files['logs'] = path
-		
+class Bootstrap:
 	"""
 
-	This function will write a row to a file, the row would have been formatted prior to being used
 	@param:
-		id: identifier {passed,fixed,broken,log}
-	        row: row to be written
+		path:	path of the file
+		rows:	number of lines of a draw
+		draws:	maximum number of draws
+		batch:	number of draws of a round (made concurrently)
+		seed:	seed of the random offsets
 
 	"""
-	def write(self,id,row):
-		if id in self.files:
-			f = open(self.files[id],'a') ;
-			f.write(row)
-			f.close();
-class Cloud(Disk):
-	def __init__(self,filename,token):
-		Disk.__init__(self,filename,token) ;
-		self.token = token;
-		pass
-		
-"""
+	def __init__(self,path,rows=200,draws=16,batch=4,seed=0):
+		self.path	= path
+		self.rows	= rows
+		self.draws	= draws
+		self.batch	= batch
+		self.seed	= seed
+	"""
 
-This class is designed to perform basic filter operation in order to plainly
-separate fields that do not meet the basic requirements in terms of number of
-columns Basic filtering is based on distinguishing records on the basis of the
-number of columns estimated in the sample
+	This function reads the lines following random offsets of the file (a line
+	cut by an offset is skipped)
 
-NOTE: This class will assign the clean method from the SamplerBuilder class so
-as to use it within it's very own context and thus available thoughout the
-class hierarchy i.e Repair class. This is possible because python is not a full
-fledged object oriented language ;-) ... call it a clever design hack!!
-	
+	"""
+	def draw(self,seed):
+		size = os.path.getsize(self.path)
+		generator = random.Random(seed)
+		offsets = sorted(generator.randrange(0,size) for i in range(0,self.rows)) if size > 0 else []
+		f = open(self.path,'rb')
+		sample = []
+		for offset in offsets:
+			f.seek(offset)
+			if offset > 0:
+				f.readline()
+			line = f.readline()
+			if len(line) > 0:
+				sample.append(line.decode('utf-8','replace'))
+		f.close()
+		return sample
+	"""
 
-"""
-class Filter(Thread):
-	def __init__(self,path,ofolder='tmp'):
-		Thread.__init__(self)
-		thread = SampleBuilder(path,1000) ;
-		thread.start() ;
-		thread.join() ;
-		
-		#
-		# Let's determine the the filename and build out output structures
-		# The files will be output to either disk or cloud ...
-		#
-		self.sample	= thread.sample ;
-		self.ncols	= thread.ncols
-		self.xchar	= thread.xchar
-		self.filename 	= path.split(os.sep)
-		self.path 	= path
-		self.clean = thread.clean	#--pointer to the function
-		self.logs = {}
-		if len(self.filename) == 1:
-			self.filename = self.filename[0]
-		else:
-			i = len(self.filename) -1 ;
-			self.filename = self.filename[i]
-		#
-		# We need to have a handler to post the output stream to either cloud/queue/disk
-		# This 
-		self.handler = Disk(self.filename,ofolder) ;
-		self.handler.init()
-	
-	def format (self,row):
-		return ",".join(row)+'\n' ;
+	This function returns the findings of a draw: (delimiter,columns,rate of lines with that many columns)
 
 	"""
+	def detect(self,seed):
+		sample = self.draw(seed)
+		thread = SampleBuilder(self.path,0)
+		try:
+			xchar = thread.row_xchar(sample)
+			ncols = thread.col_count(sample)
+		except ValueError:
+			return None
+		rate = np.mean([len(row.split(xchar)) == ncols for row in sample])
+		return (xchar,ncols,float(rate))
+	"""
 
-	The filtering will consist in being able to separate proper files
-	against the number of columns
+	This function returns the 95% Wilson interval of a proportion
 
 	"""
+	def wilson(self,p,n,z=1.96):
+		center	= (p + z*z/(2*n))/(1 + z*z/n)
+		margin	= z*math.sqrt(p*(1-p)/n + z*z/(4*n*n))/(1 + z*z/n)
+		return [round(max(0,center-margin),4),round(min(1,center+margin),4)]
 	def run(self):
-		f = open(self.path,'rU') ;
-		for row in f:
-			row = self.clean(row.split(self.xchar)) ;
-			if len(row) == self.ncols:
-				self.post('passed',row) ;
-			else:
-				self.post('broken',row) ;
-		f.close()
-		#
-		# We need to write out the logs at this point
-		# The logs capture all that happened and in the class including the findings
-		# @TODO: The data grouped here will be part of a report that will be charted
-		#
+		findings = []
+		pool = ThreadPoolExecutor(self.batch)
+		while len(findings) < self.draws:
+			seeds = [self.seed + len(findings) + i for i in range(0,min(self.batch,self.draws - len(findings)))]
+			findings += list(pool.map(self.detect,seeds))
+			votes = set([r[0:2] if r is not None else None for r in findings])
+			if len(votes) == 1:
+				break
+		pool.shutdown()
+		valid = [r for r in findings if r is not None]
+		r = {'xchar':None,'ncols':None,'draws':len(findings),'rows':self.rows}
+		if len(valid) == 0:
+			return r
+		votes = {}
+		for finding in valid:
+			votes[finding[0:2]] = votes.get(finding[0:2],0) + 1
+		xchar,ncols = max(votes,key=lambda id: votes[id])
+		rates = [finding[2] for finding in valid if finding[0:2] == (xchar,ncols)]
+		p = votes[(xchar,ncols)]/len(findings)
+		r.update({'xchar':xchar,'ncols':ncols,'agreement':round(p,4),'agreement_interval':self.wilson(p,len(findings))})
+		r['ncols_interval'] = [int(v) for v in np.percentile([finding[1] for finding in valid],[2.5,97.5])]
+		r['rate'] = round(float(np.mean(rates)),4)
+		r['rate_interval'] = [round(float(v),4) for v in np.percentile(rates,[2.5,97.5])]
+		return r
+
+"""
+
+This class is designed to keep track of records without holding them in memory:
+the byte offset, the length (in bytes) and the number of fields of every record
+are stored in compact typed arrays (30 bytes per record). The records can be
+read back from the input file when needed (see Repair.fetch)
+
+"""
+class Index:
+	RECORD	= struct.Struct('<qIHqq')	#-- offset,length,fields,line,fix of a record as it is saved (see Checkpoint)
+	def __init__(self):
+		self.offsets	= array('q')
+		self.lengths	= array('I')
+		self.fields	= array('H')
+		self.lines	= array('q')	#-- source line of the record
+		self.fixes	= array('q')	#-- offset of the repaired record in the fixed stream (-1 if none)
+	def __len__(self):
+		return len(self.offsets)
+	def __getitem__(self,i):
+		return (self.offsets[i],self.lengths[i],self.fields[i])
+	def add(self,offset,length,fields,line=0):
+		self.offsets.append(offset)
+		self.lengths.append(length)
+		self.fields.append(min(fields,65535))
+		self.lines.append(line)
+		self.fixes.append(-1)
 	"""
 
-	This function is designed to log unfit records with records that will
-	be ignored
+	These functions return the records of the index from a position on as bytes
+	and add records read back from bytes
 
 	"""
-	def post(self,id,row):
-		
-		self.handler.write(id,self.format(row) ) ;
-		if id not in self.logs:
-			self.logs[id]= 0
-		self.logs[id] = self.logs[id] + 1
-"""
+	def records(self,start=0):
+		return b''.join([self.RECORD.pack(self.offsets[i],self.lengths[i],self.fields[i],self.lines[i],self.fixes[i]) for i in range(start,len(self))])
+	def extend(self,data):
+		for offset,length,fields,line,fix in self.RECORD.iter_unpack(data):
+			self.add(offset,length,fields,line)
+			self.fixes[-1] = fix
+		return self
 
-This class is designed to perform record repairs keeping the base class
-identical and allowing to assess repairs
+"""
 
-NOTE:
-	- The base class has taken upon itself to extract the sample
-	- The Inspector class hierarchy will use the sample found
+This class is designed to represent a record read from a file without splitting
+it: the record is the line (bytes) as it was read. Most records need no cleaning
+(ascii, no white space around the fields), for those:
+	- the number of fields is the number of delimiters + 1
+	- the record is written as the line with the delimiters replaced
+	- the fields are only made (split) if they are asked for (inspection,profile)
+Records that need cleaning are given their cleaned fields (see SampleBuilder.clean)
+when they are created. A Row behaves like the list of its fields
 
 """
-class Repair(Filter):
-	def __init__(self,path,ofolder='tmp'):
-		Filter.__init__(self,path,ofolder) ;
-		self.extra 	= []
-		self.partial	= []
-		self.threads = {'px':InspectProbability(self.sample),'numeric':InspectNumericField(self.sample),'len':InspectFieldLength(self.sample),'date':InspectDateField(self.sample)} ;
-		[thread.start() for thread in self.threads.values()]
-		self.row_index = 0
+class Row:
+	__slots__ = ('line','xchar','cells')
+	SPACE = re.compile(b'[ \t\r\x0b\x0c\x1c-\x1f]')
+	"""
+
+	@param:
+		line:	line as read (bytes)
+		xchar:	delimiter (bytes)
+		cells:	cleaned fields, none if the line is clean
 
 	"""
+	def __init__(self,line,xchar,cells=None):
+		self.line	= line
+		self.xchar	= xchar
+		self.cells	= cells
+	"""
 
-	In addition to capturing and storing records this function will also
-	classify broken records.
+	This function returns a regular expression that finds what the cleaning of
+	a line would change: non-ascii characters & white spaces around fields. It
+	only needs to be run on ascii lines with white spaces (see SPACE)
 
 	"""
-	def post(self,id,row):
-		Filter.post(self,id,row)		
-		if id == 'broken':
-			if len(row) > self.ncols:
-				
-				self.extra.append( self.clean(row))
-			else:
-				#
-				# If a len(row) == 1 and self.current_row is not None
-				#	self.partial.append(self.current_row)	
-				self.partial.append(self.clean(row))
-		else:
-			self.current_row = row
-	def run(self):
-		Filter.run(self) ;
-		ids = self.threads.keys()
-		#
-		# We need to make sure the threads have finished learning what they need to learn
-		# It is only possible to continue if the threads have completed so we can run the repairs
-		#
-		while True:
-			count = [ int(thread.isAlive() == False) for thread in self.threads.values()]
-			if sum(count) == len(ids):
-				break
-		#
-		# Now we can under take repairs:
-		#	a. Records with extra delimiters will require fields to be merged
-		#	b. Partial records will require they be aggregated with other records
-		#
-		
-		if len(self.extra) > 0:
-			m = [self.merge(row) for row in self.extra]
-			[self.post('fixed',row) for row in m if row is not None]
-		
-		if len(self.partial) > 0:
-			m = [self.aggregate(row) for row in self.partial]
-			[self.post('fixed',row) for row in m if row is not None]
-		print self.logs
+	@staticmethod
+	def pattern(xchar):
+		spaces	= ''.join([c for c in ' \t\r\x0b\x0c\x1c\x1d\x1e\x1f' if c != xchar])
+		space	= '[' + re.escape(spaces) + ('' if xchar == '\n' else '\n') + ']'
+		x	= re.escape(xchar)
+		return re.compile(('[\x80-\xff]|^'+space+'|'+space+x+'|'+x+space+'|'+space+'\n\\Z|['+re.escape(spaces)+']\\Z').encode('latin-1'))
+	def __len__(self):
+		if self.cells is not None:
+			return len(self.cells)
+		return self.line.count(self.xchar) + 1
+	def fields(self):
+		if self.cells is None:
+			line = self.line[:-1] if self.line.endswith(b'\n') else self.line
+			self.cells = line.decode('ascii').split(self.xchar.decode('ascii'))
+		return self.cells
+	def __getitem__(self,i):
+		return self.fields()[i]
+	def __iter__(self):
+		return iter(self.fields())
+	"""
+
+	This function returns the record as it is written (see Filter.format)
 
 	"""
+	def format(self):
+		if self.cells is not None:
+			return ",".join(self.cells)+'\n'
+		line = self.line if self.xchar == b',' else self.line.replace(self.xchar,b',')
+		return line.decode('ascii') if line.endswith(b'\n') else line.decode('ascii')+'\n'
 
-	The merge operation consists in addressing records with an extra
-	delimiter, the function will return the end-result
+"""
+
+This class is designed to save the state of a job at regular intervals so that
+it can be resumed should it fail. The state is a dictionary written as JSON,
+the file is replaced atomically so that there is always a consistent checkpoint.
+
+A checkpoint is only used if the input file has not changed (size, mtime)
+
+"""
+class Checkpoint:
+	FIX = struct.Struct('<qq')	#-- position in the index,offset of the repaired record
+	"""
 
-	@pre
-		len(row) > self.ncols
 	@param:
-		row: row with extra delimiter
+		path:	path of the checkpoint file
+		every:	number of records processed between checkpoints (0 to disable)
 
 	"""
-	def merge(self,row):
-		#
-		# Let's find a record that is out of place, 
-		# A merger would require an alpha-numeric field to be involved,
-		# Misplaced fields are identified by either a disagreement upon inspection of a field having data or not or an agreement with the wrong data type
-		# @TODO: Consider adding inspecting type to make sure typing disagreement
-		#
-		pn = self.threads['numeric'].inspect(row)
-		px = self.threads['px'].inspect(row[0:self.ncols])
-		
-		for i in range(0,self.ncols):
-			
-			#if px[i] == pi[i] and pn[i] == 0 :
+	def __init__(self,path,every=100000):
+		self.path	= path
+		self.every	= every
+		self.records	= 0	#-- records of the index saved
+		self.fixes	= 0	#-- fixes saved
+		self.pending	= array('q')	#-- positions in the index of the fixes made since the last save
+	def save(self,state):
+		if self.every <= 0 :
+			return
+		tmp = self.path + '.tmp'
+		f = open(tmp,'w')
+		json.dump(state,f)
+		f.close()
+		os.replace(tmp,self.path)
+	"""
+
+	This function appends data to a side file of the checkpoint, the file is first
+	truncated to what the last checkpoint saved (a save may have been interrupted)
+
+	"""
+	def append(self,suffix,size,data):
+		path = self.path + suffix
+		f = open(path,'r+b' if os.path.exists(path) else 'wb')
+		f.truncate(size)
+		f.seek(size)
+		f.write(data)
+		f.close()
+	"""
+
+	This function keeps track of a fix i.e a record of the index that is updated
+	after it was added (see Repair.fix)
+
+	"""
+	def fix(self,i):
+		if self.every > 0:
+			self.pending.append(i)
+	"""
+
+	This function saves the index of broken records: the index only grows, the
+	records added since the last save are appended to a side file as are the
+	fixes made since then (the checkpoint only holds their number). This keeps
+	the cost of a checkpoint in proportion to what changed since the last one
+
+	"""
+	def store(self,index):
+		if self.every <= 0 :
+			return None
+		self.append('.index',self.records*Index.RECORD.size,index.records(self.records))
+		self.append('.fixes',self.fixes*self.FIX.size,b''.join([self.FIX.pack(i,index.fixes[i]) for i in self.pending]))
+		self.records	= len(index)
+		self.fixes	+= len(self.pending)
+		self.pending	= array('q')
+		return {'records':self.records,'fixes':self.fixes}
+	"""
+
+	This function returns the index saved by the last checkpoint
+
+	"""
+	def index(self,info):
+		self.records,self.fixes = info['records'],info['fixes']
+		r = Index()
+		f = open(self.path+'.index','rb')
+		r.extend(f.read(self.records*Index.RECORD.size))
+		f.close()
+		if self.fixes > 0:
+			f = open(self.path+'.fixes','rb')
+			for i,fix in self.FIX.iter_unpack(f.read(self.fixes*self.FIX.size)):
+				r.fixes[i] = fix
+			f.close()
+		return r
+	"""
+
+	This function returns the last state saved for a given input or None
+
+	"""
+	def load(self,source):
+		if os.path.exists(self.path) == False:
+			return None
+		f = open(self.path,'r')
+		state = json.load(f)
+		f.close()
+		info = os.stat(source)
+		if state['source'] != [info.st_size,info.st_mtime]:
+			return None
+		return state
+	def clear(self):
+		for path in [self.path,self.path+'.index',self.path+'.fixes']:
+			if os.path.exists(path):
+				os.remove(path)
+
+"""
+
+The following classes are sketches i.e bounded memory summaries of a stream of
+values that can be merged (the stream can be split in chunks processed apart).
+They are the basis of the quantitative assessment of the data (see Profile)
+
+Distinct is a HyperLogLog estimator of the number of distinct values, it counts
+exactly up to LIMIT values
+
+"""
+class Distinct:
+	LIMIT = 256
+	def __init__(self,p=12):
+		self.p		= p
+		self.values	= set()
+		self.registers	= None
+	"""
+
+	This function returns a 32 bits hash of a value (crc32 + murmur finalizer),
+	it must be identical across processes for sketches to be merged
+
+	"""
+	def hash(self,value):
+		h = zlib.crc32(value.encode('utf-8'))
+		h ^= h >> 16
+		h = (h * 0x85ebca6b) & 0xffffffff
+		h ^= h >> 13
+		h = (h * 0xc2b2ae35) & 0xffffffff
+		h ^= h >> 16
+		return h
+	def add(self,value):
+		if self.registers is None:
+			self.values.add(value)
+			if len(self.values) > self.LIMIT:
+				self.registers = bytearray(1 << self.p)
+				[self.add(value) for value in self.values]
+				self.values = None
+			return
+		h = self.hash(value)
+		j = h >> (32 - self.p)
+		w = h & ((1 << (32 - self.p)) - 1)
+		rank = (32 - self.p) - w.bit_length() + 1
+		if rank > self.registers[j]:
+			self.registers[j] = rank
+	"""
+
+	This function adds values at once: the hashes & ranks are computed over an
+	array of the values (same registers as adding them one by one)
+
+	"""
+	def update(self,values):
+		if self.registers is None:
+			self.values.update(values)
+			if len(self.values) <= self.LIMIT:
+				return self
+			values,self.values = self.values,None
+			self.registers = bytearray(1 << self.p)
+		if len(values) == 0:
+			return self
+		h = np.fromiter(map(zlib.crc32,map(str.encode,values)),dtype=np.uint64,count=len(values))
+		h ^= h >> 16
+		h = (h * 0x85ebca6b) & 0xffffffff
+		h ^= h >> 13
+		h = (h * 0xc2b2ae35) & 0xffffffff
+		h ^= h >> 16
+		j = (h >> (32 - self.p)).astype(np.int64)
+		w = h & ((1 << (32 - self.p)) - 1)
+		bits = np.where(w > 0,np.floor(np.log2(np.maximum(w,1).astype(np.float64))) + 1,0)
+		registers = np.frombuffer(self.registers,dtype=np.uint8).copy()
+		np.maximum.at(registers,j,((32 - self.p) - bits + 1).astype(np.uint8))
+		self.registers = bytearray(registers.tobytes())
+		return self
+	def merge(self,other):
+		if other.registers is None:
+			self.update(other.values)
+			return self
+		if self.registers is None:
+			values = self.values
+			self.values = None
+			self.registers = bytearray(other.registers)
+			[self.add(value) for value in values]
+		else:
+			self.registers = bytearray(np.maximum(np.frombuffer(self.registers,dtype=np.uint8),np.frombuffer(other.registers,dtype=np.uint8)).tobytes())
+		return self
+	def count(self):
+		if self.registers is None:
+			return len(self.values)
+		m = len(self.registers)
+		registers = np.frombuffer(self.registers,dtype=np.uint8)
+		estimate = (0.7213/(1 + 1.079/m)) * m * m / np.sum(np.power(2.0,-registers.astype(np.float64)))
+		zeros = int(np.count_nonzero(registers == 0))
+		if estimate <= 2.5 * m and zeros > 0:
+			estimate = m * math.log(m/zeros)
+		return int(round(estimate))
+	def dump(self):
+		if self.registers is None:
+			return {'values':list(self.values)}
+		return {'registers':base64.b64encode(bytes(self.registers)).decode('ascii')}
+	def load(self,info):
+		if 'values' in info:
+			self.values,self.registers = set(info['values']),None
+		else:
+			self.values,self.registers = None,bytearray(base64.b64decode(info['registers']))
+		return self
+
+"""
+
+Quantiles is a KLL sketch: a hierarchy of compactors, items of level h weigh
+2^h. When a level is full it is sorted and every other item is promoted to the
+next level. The error on ranks is about 1.7/k
+
+"""
+class Quantiles:
+	def __init__(self,k=200):
+		self.k		= k
+		self.compactors	= []
+		self.size	= 0
+		self.count	= 0
+		self.min	= None
+		self.max	= None
+		self.random	= random.Random(0)
+		self.grow()
+	def grow(self):
+		self.compactors.append([])
+		self.limit = sum([self.capacity(h) for h in range(0,len(self.compactors))])
+	def capacity(self,h):
+		depth = len(self.compactors) - h - 1
+		return int(math.ceil(self.k * (2/3) ** depth)) + 1
+	def add(self,value):
+		self.compactors[0].append(value)
+		self.size += 1
+		self.count += 1
+		self.min = value if self.min is None or value < self.min else self.min
+		self.max = value if self.max is None or value > self.max else self.max
+		if self.size >= self.limit:
+			self.compress()
+	"""
+
+	This function adds values at once, a value of weight w is added to the levels
+	of the bits of w (a value of level h weighs 2^h) so that values repeated in a
+	chunk (see Profile.update) are not repeated in the sketch
+
+	@param:
+		values:	values (numpy array or list)
+		weights:number of times every value occurs, none for once
+
+	"""
+	def extend(self,values,weights=None):
+		if len(values) == 0:
+			return self
+		if weights is None:
+			self.compactors[0].extend(values.tolist() if isinstance(values,np.ndarray) else values)
+			self.size += len(values)
+			self.count += len(values)
+		else:
+			values,weights = np.asarray(values),np.asarray(weights,dtype=np.int64)
+			for h in range(0,int(weights.max()).bit_length()):
+				while h >= len(self.compactors):
+					self.grow()
+				items = values[(weights >> h) & 1 == 1].tolist()
+				self.compactors[h].extend(items)
+				self.size += len(items)
+			self.count += int(weights.sum())
+		low,high = (values.min().item(),values.max().item()) if isinstance(values,np.ndarray) else (min(values),max(values))
+		self.min = low if self.min is None or low < self.min else self.min
+		self.max = high if self.max is None or high > self.max else self.max
+		while self.size >= self.limit:
+			self.compress()
+		return self
+	def compress(self):
+		for h in range(0,len(self.compactors)):
+			if len(self.compactors[h]) >= self.capacity(h):
+				if h + 1 >= len(self.compactors):
+					self.grow()
+				items = sorted(self.compactors[h])
+				rest = [items.pop()] if len(items) % 2 == 1 else []
+				self.compactors[h+1].extend(items[self.random.randint(0,1)::2])
+				self.compactors[h] = rest
+				self.size = sum([len(c) for c in self.compactors])
+				if self.size < self.limit:
+					break
+	def merge(self,other):
+		while len(self.compactors) < len(other.compactors):
+			self.grow()
+		for h in range(0,len(other.compactors)):
+			self.compactors[h].extend(other.compactors[h])
+		self.count += other.count
+		self.size = sum([len(c) for c in self.compactors])
+		for value in [other.min,other.max]:
+			if value is not None:
+				self.min = value if self.min is None or value < self.min else self.min
+				self.max = value if self.max is None or value > self.max else self.max
+		while self.size >= self.limit:
+			self.compress()
+		return self
+	"""
+
+	This function returns the values at the given ranks (0 <= q <= 1)
+
+	"""
+	def quantiles(self,qs):
+		items = sorted([(value,2 ** h) for h in range(0,len(self.compactors)) for value in self.compactors[h]])
+		if len(items) == 0:
+			return [None for q in qs]
+		total = sum([w for value,w in items])
+		r = []
+		for q in qs:
+			if q <= 0 or q >= 1:
+				r.append(self.min if q <= 0 else self.max)
+				continue
+			rank = q * total
+			weight = 0
+			for value,w in items:
+				weight += w
+				if weight >= rank:
+					break
+			r.append(value)
+		return r
+	def dump(self):
+		return {'compactors':self.compactors,'count':self.count,'min':self.min,'max':self.max}
+	def load(self,info):
+		self.compactors = []
+		for c in info['compactors']:
+			self.grow()
+		self.compactors	= [list(c) for c in info['compactors']]
+		self.size	= sum([len(c) for c in self.compactors])
+		self.count	= info['count']
+		self.min	= info['min']
+		self.max	= info['max']
+		return self
+
+"""
+
+This class profiles the records of a dataset column by column in a single pass:
+number of values, null rate, distinct values (Distinct), length and numeric
+quantiles (Quantiles) and types (see Types). Profiles of chunks of a file can be merged.
+
+Records are buffered and profiled a chunk at a time, a column of a chunk is
+profiled from its distinct values (how many times they occur) so that typing,
+counting & converting values is done once per distinct value and the sketches
+are updated in bulk. With workers the chunks are profiled by worker processes
+and their profiles merged (see collect). A large clean file is profiled on a
+sample (see Filter.assess), the profile reports how many records it was drawn from (sampled)
+
+The first record of a file is assumed to be a header (as is the case for the
+inspectors), it names the columns
+
+"""
+class Profile:
+	QUANTILES = [0,0.25,0.5,0.75,0.99,1]
+	CHUNK = 4096
+	"""
+
+	@param:
+		ncols:	number of columns
+		workers:number of worker processes profiling the chunks, 0 to profile them in this process
+
+	"""
+	def __init__(self,ncols,workers=0):
+		self.ncols	= ncols
+		self.names	= None
+		self.rows	= 0
+		self.sampled	= 0	#-- records the projected rows were profiled from (see project)
+		self.columns	= [{'nulls':0,'types':{},'distinct':Distinct(),'unseen':0,'length':Quantiles(),'numeric':Quantiles()} for i in range(0,ncols)]
+		self.buffer	= []
+		self.workers	= workers
+		self.pool	= None
+		self.jobs	= []
+	"""
+
+	@param:
+		row:	record (ncols values that have been cleaned)
+		header:	whether the record is a header
+
+	"""
+	def add(self,row,header=False):
+		if header:
+			self.names = list(row)
+			return
+		self.buffer.append(row)
+		if len(self.buffer) >= self.CHUNK:
+			self.flush()
+	"""
+
+	This function profiles the records buffered (or hands them over to a worker),
+	at most two chunks per worker are pending at a time
+
+	"""
+	def flush(self):
+		rows,self.buffer = self.buffer,[]
+		if len(rows) == 0:
+			return
+		if self.workers <= 0:
+			self.update(rows)
+			return
+		if self.pool is None:
+			self.pool = ProcessPoolExecutor(self.workers)
+		self.jobs.append(self.pool.submit(summarize,self.ncols,rows))
+		while len(self.jobs) > 2*self.workers:
+			self.merge(self.jobs.pop(0).result())
+	"""
+
+	This function profiles the records buffered & merges the profiles of the
+	workers, it is called before the profile is reported or saved
+
+	"""
+	def collect(self):
+		self.flush()
+		while len(self.jobs) > 0:
+			self.merge(self.jobs.pop(0).result())
+		return self
+	"""
+
+	This function collects the profile & stops the workers (once the records have been profiled)
+
+	"""
+	def close(self):
+		self.collect()
+		if self.pool is not None:
+			self.pool.shutdown()
+			self.pool = None
+		return self
+	"""
+
+	This function returns the values of records by column, the lines of records the
+	filter didn't have to split (see Row) are split at once: they are joined in a
+	buffer that is split on the delimiter and every ncols-th value is a column's
+
+	"""
+	def split(self,rows):
+		lines = [row.line for row in rows if isinstance(row,Row) and row.cells is None]
+		if len(lines) == 0:
+			return list(zip(*rows))[:self.ncols]
+		xchar = next(row for row in rows if isinstance(row,Row)).xchar.decode('ascii')
+		text = b''.join([line if line.endswith(b'\n') else line+b'\n' for line in lines]).decode('ascii')
+		values = (text.replace('\n',xchar) if xchar != '\n' else text).split(xchar)
+		if len(values) != self.ncols*len(lines) + 1:
+			return list(zip(*rows))[:self.ncols]
+		columns = [values[i:-1:self.ncols] for i in range(0,self.ncols)]
+		others = [row for row in rows if isinstance(row,Row) == False or row.cells is not None]
+		for i,column in enumerate(zip(*others)):
+			if i < self.ncols:
+				columns[i].extend(column)
+		return columns
+	def update(self,rows):
+		self.rows += len(rows)
+		for i,values in enumerate(self.split(rows)):
+			column = self.columns[i]
+			counts = Counter(values)
+			column['nulls'] += counts.pop('',0)
+			if len(counts) == 0:
+				continue
+			values	= list(counts.keys())
+			weights	= np.fromiter(counts.values(),dtype=np.int64,count=len(counts))
+			kinds	= np.array(TYPES.kinds(values))
+			ids,inverse = np.unique(kinds,return_inverse=True)
+			types	= column['types']
+			for id,n in zip(ids.tolist(),np.bincount(inverse,weights=weights).tolist()):
+				types[id] = types.get(id,0) + int(n)
+			column['length'].extend(np.fromiter(map(len,values),dtype=np.int64,count=len(values)),weights)
+			numeric = (kinds == 'int') | (kinds == 'float')
+			if numeric.any():
+				column['numeric'].extend(np.array(values,dtype=object)[numeric].astype(np.float64),weights[numeric])
+			column['distinct'].update(values)
+	"""
+
+	This function projects the profile of a sample of records on the records they
+	were drawn from: the counts (rows, nulls, types) are scaled, the sketches are
+	those of the sample. The distinct values of a column are estimated as if its
+	values were equally frequent: D such that D(1 - e^(-n/D)) values of D are found
+	in n, the values the sketch hasn't seen are kept aside (unseen)
+
+	@param:
+		rows:	number of records the sample was drawn from
+
+	"""
+	def project(self,rows):
+		self.collect()
+		if self.rows == 0 or rows <= self.rows:
+			return self
+		factor = rows/self.rows
+		for column in self.columns:
+			n = self.rows - column['nulls']
+			found = column['distinct'].count()
+			if n > 0 and found > 0:
+				low,high = float(found),float(n*factor)
+				for i in range(0,64):
+					D = (low + high)/2
+					if D*(1 - math.exp(-n/D)) < found:
+						low = D
+					else:
+						high = D
+				column['unseen'] += max(0,int(round(high)) - found)
+			column['nulls'] = int(round(column['nulls']*factor))
+			column['types'] = {id:int(round(n*factor)) for id,n in column['types'].items()}
+		self.sampled += self.rows
+		self.rows = rows
+		return self
+	def merge(self,other):
+		other.collect()
+		self.rows += other.rows
+		self.sampled += other.sampled
+		self.names = self.names if self.names is not None else other.names
+		for i in range(0,self.ncols):
+			column,ocolumn = self.columns[i],other.columns[i]
+			column['nulls'] += ocolumn['nulls']
+			column['unseen'] += ocolumn['unseen']
+			for id in ocolumn['types']:
+				column['types'][id] = column['types'].get(id,0) + ocolumn['types'][id]
+			for id in ['distinct','length','numeric']:
+				column[id].merge(ocolumn[id])
+		return self
+	def report(self):
+		self.close()
+		r = []
+		for i in range(0,self.ncols):
+			column = self.columns[i]
+			types = column['types']
+			distinct = column['distinct'].count() + column['unseen']
+			kind = TYPES.resolve(types,distinct)['type'] if len(types) > 0 else None
+			info = {'column':i,'name':self.names[i] if self.names is not None and i < len(self.names) else None,'type':kind,'types':types}
+			info['null_rate'] = round(column['nulls']/self.rows,4) if self.rows > 0 else None
+			info['distinct'] = distinct
+			info['length'] = dict(zip([str(q) for q in self.QUANTILES],column['length'].quantiles(self.QUANTILES)))
+			if column['numeric'].count > 0:
+				info['numeric'] = dict(zip([str(q) for q in self.QUANTILES],column['numeric'].quantiles(self.QUANTILES)))
+			r.append(info)
+		r = {'rows':self.rows,'columns':r}
+		if self.sampled > 0:
+			r['sampled'] = self.sampled
+		return r
+	def dump(self):
+		self.collect()
+		return {'names':self.names,'rows':self.rows,'sampled':self.sampled,'columns':[{'nulls':c['nulls'],'types':c['types'],'distinct':c['distinct'].dump(),'unseen':c['unseen'],'length':c['length'].dump(),'numeric':c['numeric'].dump()} for c in self.columns]}
+	def load(self,info):
+		self.names,self.rows = info['names'],info['rows']
+		self.sampled = info.get('sampled',0)
+		for i in range(0,self.ncols):
+			c = info['columns'][i]
+			self.columns[i] = {'nulls':c['nulls'],'types':c['types'],'distinct':Distinct().load(c['distinct']),'unseen':c.get('unseen',0),'length':Quantiles().load(c['length']),'numeric':Quantiles().load(c['numeric'])}
+		return self
+
+"""
+
+This function profiles the records of a byte range of a file, the range starts
+and ends at line boundaries. It is meant to be run by a worker process (see
+Filter.assess), the profiles of the ranges are then merged
+
+@param:
+	rows:	number of lines to profile at most, none for the whole range
+
+"""
+def profile(path,xchar,ncols,start,end,rows=None):
+	r = Profile(ncols)
+	f = open(path,'rb')
+	f.seek(start)
+	offset = start
+	while offset < end and (rows is None or rows > 0):
+		line = f.readline()
+		if len(line) == 0:
+			break
+		if rows is not None:
+			rows -= 1
+		if line.isascii():
+			row = [col.strip() for col in line.decode('ascii').split(xchar)]
+		else:
+			row = [re.sub('[^\x00-\x7F,\n,\r,\v,\b]',' ',col.strip()) for col in line.decode('utf-8','replace').split(xchar)]	#-- as SampleBuilder.clean
+		if len(row) == ncols:
+			r.add(row,offset == 0)
+		offset += len(line)
+	f.close()
+	return r.collect()
+
+"""
+
+This function profiles records (a chunk), it is meant to be run by a worker process (see Profile.flush)
+
+"""
+def summarize(ncols,rows):
+	r = Profile(ncols)
+	r.update(rows)
+	return r
+
+"""
+
+This class is designed to tell whether a file is clean i.e whether the filter
+would write it out unchanged, in which case it can be copied (or linked) rather
+than going through records one by one. The file is read through mmap in blocks
+and assessed with NumPy, a file is clean if:
+	- every line has ncols-1 delimiters (and the delimiter is a comma, the
+	output delimiter)
+	- there are no non-ascii bytes and no carriage returns
+	- no field starts or ends with a white space (clean strips them)
+
+"""
+class Validator:
+	BLOCK = 1 << 24
+	def __init__(self,xchar,ncols):
+		self.xchar	= xchar
+		self.ncols	= ncols
+		self.space	= np.zeros(256,dtype=bool)
+		self.space[[9,11,12,13,28,29,30,31,32]] = True	#-- white spaces other than new line
+	"""
+
+	This function returns (clean,lines,newline) where newline tells whether the
+	last line ends with a new line
+
+	@param:
+		path:	path of the file to validate
+
+	"""
+	def check(self,path):
+		size = os.path.getsize(path)
+		if self.xchar != ',' or self.ncols is None:
+			return False,0,True
+		if size == 0:
+			return True,0,True
+		delim	= ord(self.xchar)
+		newline	= ord('\n')
+		f = open(path,'rb')
+		m = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+		lines	= 0
+		carry	= 0	#-- delimiters of the line that continues in the next block
+		clean	= True
+		block	= None
+		try:
+			for start in range(0,size,self.BLOCK):
+				end = min(start+self.BLOCK,size)
+				#
+				# The block is extended by a byte on both sides to assess the fields at the boundaries
+				#
+				xstart,xend = max(start-1,0),min(end+1,size)
+				block = np.frombuffer(m,dtype=np.uint8,count=xend-xstart,offset=xstart)
+				if block.max() > 127 or np.any(block == 13):
+					clean = False
+					break
+				bounds = (block == delim) | (block == newline)
+				space = self.space[block]
+				if np.any(bounds[:-1] & space[1:]) or np.any(bounds[1:] & space[:-1]) or (xstart == 0 and space[0]) or (xend == size and space[-1]):
+					clean = False
+					break
+				block = block[start-xstart:len(block)-(xend-end)]
+				nl = np.flatnonzero(block == newline)
+				if len(nl) > 0:
+					starts = np.concatenate(([0],nl[:-1]+1))
+					counts = np.add.reduceat((block == delim).astype(np.int64),starts)
+					#
+					# reduceat sums up to the next start, the last complete line ends at the last new line
+					#
+					counts[-1] = np.count_nonzero(block[starts[-1]:nl[-1]] == delim)
+					counts[0] += carry
+					if np.any(counts != self.ncols - 1):
+						clean = False
+						break
+					lines += len(nl)
+					carry = int(np.count_nonzero(block[nl[-1]+1:] == delim))
+				else:
+					carry += int(np.count_nonzero(block == delim))
+			complete = m[size-1] == newline
+			if clean and complete == False:
+				clean = carry == self.ncols - 1
+				lines += 1
+		finally:
+			block = None	#-- the views of the map must be released before it is closed
+			m.close()
+			f.close()
+		return clean,lines,complete
+
+"""
+
+This class is designed to keep a job within budgets so that it never takes over
+the node it runs on:
+	- time & memory budgets of the job: once one is spent the job degrades to a
+	filter i.e broken records are neither indexed nor repaired any longer (they
+	are in the broken stream already)
+	- limits per record: records with too many extra delimiters (fields), too
+	long (length) or split over too many lines (span) are left broken, and the
+	greedy merge doesn't recurse beyond a depth
+
+What was degraded is part of the report of the job (see report)
+
+"""
+class Budget:
+	"""
+
+	@param:
+		time:	seconds the job may take
+		memory:	resident memory (MB) the process may use
+		fields:	extra delimiters a record may have to be merged
+		length:	bytes a record may have to be repaired
+		span:	partial records that may be aggregated into a record
+		depth:	recursion depth of the greedy merge
+		every:	number of checks between two readings of the memory
+
+	"""
+	def __init__(self,time=None,memory=None,fields=None,length=None,span=None,depth=None,every=1024):
+		self.limits	= {'time':time,'memory':memory,'fields':fields,'length':length,'span':span,'depth':depth}
+		self.every	= every
+		self.started	= None
+		self.checks	= 0
+		self.spent	= None	#-- budget spent {time,memory}
+		self.degraded	= []	#-- what was given up when a budget was spent
+		self.skipped	= {}	#-- records left broken by a limit {fields,length,span,depth}
+		self.start()
+	def start(self):
+		self.started	= time.time()
+	"""
+
+	This function returns the resident memory of the process (MB)
+
+	"""
+	def memory(self):
+		try:
+			f = open('/proc/self/statm')
+			pages = int(f.read().split()[1])
+			f.close()
+			return pages * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+		except (IOError,OSError,ValueError):
+			return Monitor(False).memory() / 1024 if resource is not None else 0
+	"""
+
+	This function returns the budget that has been spent (time|memory) or None,
+	it is meant to be called for every record (the memory is read every so often)
+
+	"""
+	def exceeded(self):
+		if self.spent is not None:
+			return self.spent
+		if self.limits['time'] is not None and time.time() - self.started > self.limits['time']:
+			self.spent = 'time'
+		elif self.limits['memory'] is not None:
+			self.checks += 1
+			if self.checks % self.every == 0 and self.memory() > self.limits['memory']:
+				self.spent = 'memory'
+		return self.spent
+	"""
+
+	This function records what was given up because a budget was spent
+
+	@param:
+		phase:		stage of the job {filter,merge,aggregate}
+		position:	where the stage stopped (offset or position in the index)
+		pending:	number of broken records that will not be repaired
+
+	"""
+	def degrade(self,phase,position,pending):
+		self.degraded.append({'budget':self.spent,'phase':phase,'position':position,'pending':pending,'elapsed':round(time.time() - self.started,3)})
+	"""
+
+	This function tells whether a record is within the limits, the records that
+	are not are counted (skipped)
+
+	@param:
+		id:	limit {fields,length,span,depth}
+		value:	value of the record
+
+	"""
+	def allows(self,id,value):
+		if self.limits[id] is None or value <= self.limits[id]:
+			return True
+		self.skipped[id] = self.skipped.get(id,0) + 1
+		return False
+	def report(self):
+		return {'limits':{id:self.limits[id] for id in self.limits if self.limits[id] is not None},'degraded':self.degraded,'skipped':self.skipped}
+	def dump(self):
+		return {'degraded':self.degraded,'skipped':self.skipped,'spent':self.spent}
+	def load(self,info):
+		self.degraded,self.skipped,self.spent = info['degraded'],info['skipped'],info['spent']
+		return self
+
+"""
+
+The output class hierarchy will determine where the content will be sent:
+	- Disk
+	- Cloud dropbox, google-drive, one-drive, s3 , big-table
+	- Queue (rabbitmq)
+
+"""
+class Output(Thread):
+	def __init__(self,filename,folder):
+		self.filename	= filename ;
+		self.folder	= folder;
+		self.key 	= str(uuid.uuid1())
+	def write(self,line):
+		pass
+class Disk(Output):
+	SAMPLE = 64	#-- one write in SAMPLE is timed (see write)
+	def __init__(self,filename,folder,monitor=None):
+		Output.__init__(self,filename,folder) ;
+		self.monitor = monitor if monitor is not None else Monitor(False)
+		self.streams = ['passed','fixed','broken','logs']
+		self.pending = [0,0,0,0]	#-- rows & bytes written since the last timed write, (wall,cpu) of a write
+		
+	"""
+
+	This function creates the output files, when resuming the files are truncated
+	to the sizes they had at the checkpoint rather than emptied
+
+	@param:
+		sizes:	{id:size} of the output files
+
+	"""
+	def init(self,sizes=None):
+		prefix = os.sep.join([self.folder])
+		lfolders =[prefix] + [ os.sep.join([prefix,f]) for f in self.streams]
+		self.files = {}
+		for folder in lfolders:
+			if os.path.exists(folder) == False:
+				print(folder)
+				#
+				# Several processes of a batch may be creating the folders at the same time
+				#
+				os.makedirs(folder,exist_ok=True)
+			if folder != prefix:
+				path = os.sep.join([folder,self.filename])
+				id = folder.split(os.sep)[-1]
+				#
+				# An output may be a hard link to the input (see Filter.copy), it is never opened for writing:
+				# it is replaced by a file of its own (that keeps what was written when resuming)
+				#
+				if sizes is not None and id in sizes and os.path.exists(path):
+					if os.stat(path).st_nlink > 1:
+						source = open(path,'rb')
+						f = open(path+'.tmp','wb')
+						shutil.copyfileobj(source,f)
+						source.close()
+						f.close()
+						os.replace(path+'.tmp',path)
+					f = open(path,'r+b')
+					f.truncate(sizes[id])
+				else:
+					if os.path.exists(path):
+						os.remove(path)
+					f = open(path,'w') ;
+				f.close()
+				if re.match('^.*fixed.*$',folder) is not None:
+					self.files['fixed'] = path
+				elif re.match('^.*passed.*$',folder) is not None:
+					self.files['passed'] = path
+				elif re.match('^.*broken.*$',folder) is not None:
+					self.files['broken'] = path
+				elif re.match('^.*logs.*$',folder) is not None:
+					self.files['logs'] = path
+				else:
+					self.files[id] = path
+		
+	"""
+
+	This function will write a row to a file, the row would have been formatted prior to being used.
+	Rows & bytes are counted for every row but only one write in SAMPLE is timed,
+	the time of the others is taken to be the same (reading the clocks of every write costs as much as a write)
+	@param:
+		id: identifier {passed,fixed,broken,log}
+	        row: row to be written
+
+	"""
+	def write(self,id,row):
+		if id in self.files:
+			timed = False
+			if self.monitor.enabled :
+				pending = self.pending
+				pending[0] += 1
+				pending[1] += len(row)
+				timed = pending[0] >= self.SAMPLE or pending[2] == 0	#-- the first write is timed as well
+				if timed :
+					wall,cpu = time.perf_counter(),time.process_time()
+			f = open(self.files[id],'a') ;
+			f.write(row)
+			f.close();
+			if timed :
+				pending[2],pending[3] = time.perf_counter()-wall,time.process_time()-cpu
+				self.measure()
+	"""
+
+	This function adds the writes counted since the last timed write to the monitor
+
+	"""
+	def measure(self):
+		rows,size,wall,cpu = self.pending
+		if rows > 0:
+			self.monitor.add('write',wall*rows,cpu*rows,rows,0,size)
+		self.pending = [0,0,wall,cpu]
+	def sizes(self):
+		return {id:os.path.getsize(self.files[id]) for id in self.files}
+	def tell(self,id):
+		return os.path.getsize(self.files[id])
+	"""
+
+	These functions make sure what was written is on disk (flush) and release
+	the resources of the output (close)
+
+	"""
+	def flush(self):
+		self.measure()
+	def close(self):
+		self.measure()
+
+"""
+
+This class is designed to write the passed & fixed streams in parts rather than
+a file each, so that they can be loaded in parallel downstream. Records go to:
+	- the current part until it has <rows> records or <size> bytes (rolling)
+	- the part given by the hash of the value of a column (partitioning)
+
+The parts are written by a pool of writer threads (a part is owned by a
+writer), records are handed over to them in batches. A manifest of the parts
+(rows, bytes, sha256) is written to the logs folder every time the output is
+flushed (see Filter.report)
+
+"""
+class Shards(Disk):
+	BATCH = 4096
+	SHARDED = ['passed','fixed']
+	"""
+
+	@param:
+		rows:	number of records of a part (rolling)
+		size:	number of bytes of a part (rolling)
+		column:	column of the records (as written) to partition on
+		parts:	number of parts to partition into
+		workers:number of writer threads
+
+	"""
+	def __init__(self,filename,folder,monitor=None,rows=None,size=None,column=None,parts=8,workers=4):
+		Disk.__init__(self,filename,folder,monitor)
+		self.rows	= rows
+		self.size	= size
+		self.column	= column
+		self.nparts	= parts
+		self.workers	= [Writer(self) for i in range(0,max(1,workers))]
+		self.parts	= {}
+		self.buffers	= {}
+	"""
+
+	This function returns the path of the n-th part of a stream
+
+	"""
+	def part(self,id,n):
+		name,ext = os.path.splitext(self.filename)
+		return os.sep.join([self.folder,id,'%s.%05d%s' % (name,n,ext)])
+	def init(self,sizes=None):
+		Disk.init(self,sizes)
+		for id in self.SHARDED:
+			#
+			# The parts replace the file of the stream, when resuming the parts are
+			# truncated to their size at the checkpoint (and their checksum recomputed)
+			#
+			os.remove(self.files[id])
+			self.parts[id] = []
+			self.buffers[id] = {}
+			for path in glob.glob(self.part(id,0).replace('00000','[0-9]'*5)):
+				if sizes is None or path not in sizes:
+					os.remove(path)
+			n = 0
+			while sizes is not None and self.part(id,n) in sizes:
+				self.parts[id].append(self.create(id,n,sizes[self.part(id,n)]))
+				n += 1
+			if len(self.parts[id]) == 0:
+				count = self.nparts if self.column is not None else 1
+				self.parts[id] = [self.create(id,n) for n in range(0,count)]
+		[writer.start() for writer in self.workers]
+	"""
+
+	This function creates the n-th part of a stream, resuming keeps what was
+	written up to the given size (the part is then only deleted by init if the
+	size isn't known)
+
+	"""
+	def create(self,id,n,size=0):
+		info = {'path':self.part(id,n),'rows':0,'bytes':0,'sha256':hashlib.sha256(),'writer':self.workers[n % len(self.workers)]}
+		f = open(info['path'],'ab')
+		f.truncate(size)
+		f.close()
+		if size > 0:
+			f = open(info['path'],'rb')
+			for block in iter(lambda: f.read(Filter.BLOCK),b''):
+				info['sha256'].update(block)
+				info['rows'] += block.count(b'\n')
+			f.close()
+		info['bytes'] = size
+		return info
+	def write(self,id,row):
+		if id not in self.parts:
+			return Disk.write(self,id,row)
+		parts = self.parts[id]
+		if self.column is not None:
+			values = row.split(',')
+			value = values[self.column] if self.column < len(values) else ''
+			n = zlib.crc32(value.strip().encode('utf-8')) % len(parts)
+		else:
+			n = len(parts) - 1
+			info = parts[n]
+			if (self.rows is not None and info['rows'] >= self.rows) or (self.size is not None and info['bytes'] >= self.size):
+				self.submit(id,n)
+				n += 1
+				parts.append(self.create(id,n))
+		info = parts[n]
+		info['rows']	+= 1
+		info['bytes']	+= len(row)
+		buffer = self.buffers[id].setdefault(n,[])
+		buffer.append(row)
+		if len(buffer) >= self.BATCH:
+			self.submit(id,n)
+	"""
+
+	This function hands the buffered records of a part over to its writer
+
+	"""
+	def submit(self,id,n):
+		buffer = self.buffers[id].pop(n,[])
+		if len(buffer) > 0:
+			info = self.parts[id][n]
+			info['writer'].queue.put((info,buffer))
+	def flush(self):
+		Disk.flush(self)
+		for id in self.buffers:
+			[self.submit(id,n) for n in list(self.buffers[id].keys())]
+		[writer.queue.join() for writer in self.workers]
+		#
+		# The sizes of the parts are those written (the sizes are estimated as records come in)
+		#
+		for id in self.parts:
+			for info in self.parts[id]:
+				info['bytes'] = os.path.getsize(info['path'])
+		manifest = {'file':self.filename,'streams':{id:[{'path':info['path'],'rows':info['rows'],'bytes':info['bytes'],'sha256':info['sha256'].hexdigest()} for info in self.parts[id]] for id in self.parts}}
+		path = os.sep.join([self.folder,'logs',self.filename+'.manifest.json'])
+		f = open(path+'.tmp','w')
+		f.write(json.dumps(manifest))
+		f.close()
+		os.replace(path+'.tmp',path)
+		return manifest
+	def sizes(self):
+		self.flush()
+		r = {id:os.path.getsize(self.files[id]) for id in self.files if id not in self.parts}
+		for id in self.parts:
+			r.update({info['path']:os.path.getsize(info['path']) for info in self.parts[id]})
+		return r
+	def close(self):
+		self.flush()
+		[writer.queue.put(None) for writer in self.workers]
+		[writer.join() for writer in self.workers]
+
+"""
+
+This class is designed to write batches of records to the parts it owns (see Shards)
+
+"""
+class Writer(Thread):
+	def __init__(self,shards):
+		Thread.__init__(self)
+		self.daemon	= True
+		self.shards	= shards
+		self.queue	= Queue(64)
+	def run(self):
+		while True:
+			job = self.queue.get()
+			if job is None:
+				self.queue.task_done()
+				break
+			info,rows = job
+			wall,cpu = time.perf_counter(),time.process_time()
+			data = ''.join(rows).encode('utf-8')
+			f = open(info['path'],'ab')
+			f.write(data)
+			f.close()
+			info['sha256'].update(data)
+			if self.shards.monitor.enabled:
+				self.shards.monitor.add('write',time.perf_counter()-wall,time.process_time()-cpu,len(rows),0,len(data))
+			self.queue.task_done()
+class Cloud(Disk):
+	def __init__(self,filename,token):
+		Disk.__init__(self,filename,token) ;
+		self.token = token;
+		pass
+		
+"""
+
+This class is designed to perform basic filter operation in order to plainly
+separate fields that do not meet the basic requirements in terms of number of
+columns Basic filtering is based on distinguishing records on the basis of the
+number of columns estimated in the sample
+
+NOTE: This class will assign the clean method from the SamplerBuilder class so
+as to use it within it's very own context and thus available thoughout the
+class hierarchy i.e Repair class. This is possible because python is not a full
+fledged object oriented language ;-) ... call it a clever design hack!!
+	
+
+"""
+class Filter(Thread):
+	"""
+
+	@param:
+		path:		path of the file to process
+		ofolder:	output folder
+		monitor:	instrumentation (see Monitor)
+		resume:		resume from the last checkpoint if there is one
+		checkpoint:	number of records between checkpoints (0 to disable)
+		model:		findings of a previous sampling (see learn), the file is then not sampled
+		validate:	copy clean files as a whole rather than record by record (see Validator)
+		link:		hard-link clean files rather than copying them (where possible)
+		profile:	profile the columns of the records written (see Profile)
+		order:		write the passed & fixed records in the order of the input to an <ordered> stream
+		tag:		prefix every record written with its line in the input (first line of a repaired record)
+		shard:		write the passed & fixed streams in parts (see Shards) e.g {'rows':100000} or {'column':0,'parts':8}
+		bootstrap:	confirm the delimiter & number of columns on random samples of the file (see Bootstrap)
+		limits:		budgets of the job & limits per record (see Budget) e.g {'time':3600,'memory':2048,'fields':8}
+
+	"""
+	def __init__(self,path,ofolder='tmp',monitor=None,resume=False,checkpoint=100000,model=None,validate=True,link=False,profile=False,order=False,tag=False,shard=None,bootstrap=False,limits=None):
+		Thread.__init__(self)
+		self.monitor = monitor if monitor is not None else Monitor()
+		self.filename 	= path.split(os.sep)
+		self.path 	= path
+		if len(self.filename) == 1:
+			self.filename = self.filename[0]
+		else:
+			i = len(self.filename) -1 ;
+			self.filename = self.filename[i]
+		self.checkpoint = Checkpoint(os.sep.join([ofolder,'logs',self.filename+'.checkpoint']),checkpoint)
+		self.state = self.checkpoint.load(path) if resume and os.path.exists(path) else None
+		
+		#
+		# When resuming the sample & its findings are those of the checkpoint
+		#
+		self.trained = self.state if self.state is not None else model
+		thread = SampleBuilder(path,1000,self.monitor,bootstrap) if self.trained is None else SampleBuilder(path,0)
+		if self.trained is not None:
+			thread.xchar	= self.trained['xchar']
+			thread.ncols	= self.trained['ncols']
+			thread.sample	= self.trained['sample']
+		thread.start() ;
+		thread.join() ;
+		
+		#
+		# Let's determine the the filename and build out output structures
+		# The files will be output to either disk or cloud ...
+		#
+		self.sample	= thread.sample ;
+		self.ncols	= thread.ncols
+		self.xchar	= thread.xchar
+		self.clean = thread.clean	#--pointer to the function
+		self.dirty	= Row.pattern(self.xchar) if self.xchar is not None else None	#-- what cleaning would change (see Row)
+		self.types	= None	#-- types of the columns of the sample (see Types)
+		self.limits	= Budget(**(limits if limits is not None else {}))
+		if self.state is not None and 'limits' in self.state:
+			self.limits.load(self.state['limits'])
+		self.estimate	= thread.estimate if self.trained is None else self.trained.get('estimate')
+		self.logs = {}
+		self.index = Index()	#-- broken records (see Index)
+		self.position = None	#-- (offset,length,line) of the record being scanned
+		self.lines	= 0	#-- number of lines scanned
+		self.sequenced	= [1,0,0]	#-- (line,offset in the passed stream,position in the index) the ordered stream is at
+		self.phase	= ['filter',0]	#-- stage of the job & position within the stage (see state)
+		self.validate	= validate
+		self.link	= link
+		self.order	= order
+		self.tag	= tag
+		self.profile	= Profile(self.ncols,self.PROFILERS) if profile else None
+		if self.profile is not None and self.state is not None and 'profile' in self.state:
+			self.profile.load(self.state['profile'])
+		if self.state is not None:
+			self.logs	= self.state['logs']
+			self.index	= self.checkpoint.index(self.state['index'])
+			self.phase	= self.state['phase']
+			self.lines	= self.state.get('lines',0)
+		#
+		# We need to have a handler to post the output stream to either cloud/queue/disk
+		# This 
+		if shard is not None and order:
+			raise ValueError('the ordered stream is built from the passed & fixed streams, they can not be sharded')
+		self.shard	= shard
+		self.handler = Disk(self.filename,ofolder,self.monitor) if shard is None else Shards(self.filename,ofolder,self.monitor,**shard) ;
+		if self.order:
+			self.handler.streams.append('ordered')
+		self.handler.init(self.state['outputs'] if self.state is not None else None)
+	
+	def format (self,row):
+		if isinstance(row,Row):
+			return row.format()
+		return ",".join(row)+'\n' ;
+
+	"""
+
+	The filtering will consist in being able to separate proper files
+	against the number of columns
+
+	"""
+	def run(self):
+		if self.phase[0] == 'filter':
+			self.scan(self.phase[1])
+		if self.order:
+			self.sequence()
+		self.report()
+		self.handler.close()
+		self.checkpoint.clear()
+	"""
+
+	This function returns the state of the job (see Checkpoint), it holds
+	everything needed to resume: the position in the input, the size of the
+	outputs, the counters, the index of broken records and what was learnt
+	from the sample
+
+	@param:
+		phase:	stage of the job {filter,merge,aggregate}
+		cursor:	input offset (filter) or position in the index (merge,aggregate)
+
+	"""
+	def save(self,phase,cursor):
+		info = os.stat(self.path)
+		state = {'source':[info.st_size,info.st_mtime],'xchar':self.xchar,'ncols':self.ncols,'sample':self.sample,'phase':[phase,cursor],'outputs':self.handler.sizes(),'logs':self.logs,'index':self.checkpoint.store(self.index),'inspectors':self.params(),'lines':self.lines,'estimate':self.estimate,'limits':self.limits.dump()}
+		if self.profile is not None:
+			state['profile'] = self.profile.dump()
+		self.checkpoint.save(state)
+	"""
+
+	This function returns the parameters learnt by the inspectors (none for a filter)
+
+	"""
+	def params(self):
+		return {}
+	"""
+
+	This function goes over the file and posts every record as passed or broken
+	The file is read in binary mode so as to keep track of the byte offset of
+	every record. Records are Rows (only split & cleaned if need be), ROWS set to
+	False reads them as lists of cleaned fields instead
+
+	@param:
+		offset:	byte offset from which to start (resuming)
+		end:	byte offset at which to stop (a line boundary), the end of the file by default
+
+	"""
+	def scan(self,offset=0,end=None):
+		if offset == 0 and self.validate and self.tag == False and self.shard is None and self.copy():
+			return
+		self.monitor.start('filter')
+		rows = 0
+		start = offset
+		xchar = self.xchar.encode('utf-8')
+		space = Row.SPACE
+		f = open(self.path,'rb') ;
+		f.seek(offset)
+		for line in f:
+			if end is not None and offset >= end:
+				break
+			if self.ROWS and line.isascii() and (space.search(line) is None or self.dirty.search(line) is None):
+				row = Row(line,xchar)
+			else:
+				row = self.clean(line.decode('utf-8','replace').split(self.xchar)) ;
+				row = Row(line,xchar,row) if self.ROWS else row
+			self.lines += 1
+			self.position = (offset,len(line),self.lines)
+			if len(row) == self.ncols:
+				self.post('passed',row) ;
+			else:
+				self.post('broken',row) ;
+			offset += len(line)
+			rows += 1
+			if self.checkpoint.every > 0 and rows % self.checkpoint.every == 0:
+				self.save('filter',offset)
+		f.close()
+		self.monitor.stop('filter',rows,offset - start)
+	"""
+
+	This function writes a clean file (see Validator) to the passed stream as a
+	whole, it returns False if the file isn't clean
+
+	"""
+	def copy(self):
+		self.monitor.start('validate')
+		clean,lines,complete = Validator(self.xchar,self.ncols).check(self.path)
+		size = os.path.getsize(self.path)
+		self.monitor.stop('validate',lines,size)
+		if clean == False:
+			return False
+		self.monitor.start('write')
+		target = self.handler.files['passed']
+		linked = False
+		if self.link and complete:
+			try:
+				os.remove(target)
+				os.link(self.path,target)
+				linked = True
+			except OSError:
+				linked = False
+		if linked == False:
+			source = open(self.path,'rb')
+			f = open(target,'wb')
+			shutil.copyfileobj(source,f,self.BLOCK)
+			if complete == False:
+				f.write(b'\n')
+			f.close()
+			source.close()
+		self.monitor.stop('write',lines,0,size + int(complete == False))
+		if lines > 0:
+			self.logs['passed'] = self.logs.get('passed',0) + lines
+		if self.profile is not None:
+			self.monitor.start('profile')
+			self.profile.merge(self.assess(size,lines))
+			self.monitor.stop('profile',lines,size)
+		return True
+	"""
+
+	This function profiles a clean file (see copy): a file of at most SAMPLE lines
+	is split in ranges (at line boundaries) that are profiled by PROFILERS worker
+	processes and merged, a larger file is profiled on a sample of blocks of lines
+	at random offsets that is projected on its lines (see Profile.project) so that
+	the profile costs about the same whatever the size of the file
+
+	@param:
+		size:	size of the file
+		lines:	number of lines of the file (header included)
+
+	"""
+	def assess(self,size,lines):
+		r = Profile(self.ncols)
+		if size == 0:
+			return r
+		f = open(self.path,'rb')
+		if lines > self.SAMPLE:
+			generator = random.Random(0)
+			offsets = [0] + sorted(generator.randrange(1,size) for i in range(1,self.BLOCKS))
+			count = int(self.SAMPLE/self.BLOCKS)
+		else:
+			workers = max(1,self.PROFILERS)
+			offsets = [int(size*i/workers) for i in range(0,workers)]
+			count = None
+		bounds = [0]
+		for offset in offsets[1:]:
+			f.seek(max(offset,bounds[-1]))
+			f.readline()
+			bounds.append(max(f.tell(),bounds[-1]))
+		f.close()
+		bounds.append(size)
+		ranges = [(bounds[i],bounds[i+1]) for i in range(0,len(bounds)-1) if bounds[i+1] > bounds[i]]
+		if len(ranges) <= 1 or count is not None:
+			[r.merge(profile(self.path,self.xchar,self.ncols,start,end,count)) for start,end in ranges]
+		else:
+			pool = ProcessPoolExecutor(len(ranges))
+			jobs = [pool.submit(profile,self.path,self.xchar,self.ncols,start,end) for start,end in ranges]
+			[r.merge(job.result()) for job in jobs]
+			pool.shutdown()
+		return r.project(lines - 1) if count is not None else r
+	BLOCK = 1 << 24
+	ROWS = True
+	PROFILERS = max(0,min(2,(os.cpu_count() or 1)-1))	#-- worker processes profiling the records written (see Profile)
+	SAMPLE = 1 << 15	#-- lines of a clean file profiled, a larger file is profiled on a sample (see assess)
+	BLOCKS = 16	#-- blocks of lines the sample is drawn in
+	INDEX = False	#-- broken records are indexed for repairs (see Repair) or to be ordered (see sequence)
+	"""
+
+	This function writes the passed & fixed records in the order of the input to
+	the ordered stream. The passed stream is in the order of the input and so is
+	the index of broken records: the passed records found between two broken
+	records are copied as they are and the repaired record (if any) is read back
+	from the fixed stream at the offset kept in the index. Nothing is sorted and
+	only a record at a time is held in memory.
+
+	The ordered stream can be written in several steps (see Follow), it is then
+	appended to from where the previous step stopped
+
+	@param:
+		upto:	position in the index up to which the records are final, all of them by default
+
+	"""
+	def sequence(self,upto=None):
+		self.monitor.start('order')
+		line,offset,start = self.sequenced
+		upto = len(self.index) if upto is None else upto
+		passed	= open(self.handler.files['passed'],'rb')
+		fixed	= open(self.handler.files['fixed'],'rb')
+		f	= open(self.handler.files['ordered'],'wb' if offset == 0 and start == 0 else 'ab')
+		passed.seek(offset)
+		rows,size = 0,0
+		for i in range(start,upto):
+			for k in range(line,self.index.lines[i]):
+				record = passed.readline()
+				f.write(record)
+				rows,size = rows + 1,size + len(record)
+			line = self.index.lines[i] + 1
+			if self.index.fixes[i] >= 0:
+				fixed.seek(self.index.fixes[i])
+				record = fixed.readline()
+				f.write(record)
+				rows,size = rows + 1,size + len(record)
+		if upto < len(self.index):
+			for k in range(line,self.index.lines[upto]):
+				record = passed.readline()
+				f.write(record)
+				rows,size = rows + 1,size + len(record)
+			line = self.index.lines[upto]
+		else:
+			record = passed.read(self.BLOCK)
+			while len(record) > 0:
+				f.write(record)
+				rows,size = rows + record.count(b'\n'),size + len(record)
+				line += record.count(b'\n')
+				record = passed.read(self.BLOCK)
+		self.sequenced = [line,passed.tell(),upto]
+		f.close()
+		fixed.close()
+		passed.close()
+		self.monitor.stop('order',rows,size,size)
+	"""
+
+	We need to write out the logs at this point
+	The logs capture all that happened and in the class including the findings
+	@TODO: The data grouped here will be part of a report that will be charted
+
+	"""
+	def report(self):
+		self.handler.flush()
+		r = {'file':self.path,'mode':self.__class__.__name__.lower(),'counts':self.logs}
+		r.update(self.monitor.report())
+		if self.profile is not None:
+			r['profile'] = self.profile.report()
+		if self.estimate is not None:
+			r['bootstrap'] = self.estimate
+		r['budget'] = self.limits.report()
+		if self.types is None and len(self.sample) > 1:
+			names = self.sample[0]
+			self.types = [dict(TYPES.infer(list(column)),column=i,name=names[i]) for i,column in enumerate(zip(*self.sample[1:]))]
+			[info.pop('kinds') for info in self.types]
+		r['types'] = self.types
+		self.handler.write('logs',json.dumps(r)+'\n')
+		self.summary = r
+		return r
+	"""
+
+	This function is designed to log unfit records with records that will
+	be ignored
+
+	"""
+	def post(self,id,row):
+		
+		record = self.format(row)
+		if self.tag and self.position is not None:
+			record = ('line' if id == 'passed' and self.position[0] == 0 else str(self.position[2])) + ',' + record
+		self.handler.write(id,record) ;
+		if id not in self.logs:
+			self.logs[id]= 0
+		self.logs[id] = self.logs[id] + 1
+		if self.profile is not None and id != 'broken':
+			self.profile.add(row,id == 'passed' and self.position is not None and self.position[0] == 0)
+		if id == 'broken' and self.position is not None and (self.INDEX or self.order):
+			#
+			# Once a budget is spent the job is a filter, broken records are no longer kept for repairs
+			#
+			if self.limits.exceeded() is None:
+				self.index.add(self.position[0],self.position[1],len(row),self.position[2])
+			elif len(self.limits.degraded) == 0 or self.limits.degraded[-1]['phase'] != 'filter':
+				self.limits.degrade('filter',self.position[0],None)
+"""
+
+This class is designed to find the best way to merge the fields of a record
+with unexpected delimiters. A record with n fields and k = n - ncols extra
+delimiters is a partition of its fields into ncols contiguous groups:
+
+	- every candidate value (column j made of fields a..b) is scored in a
+	single batched evaluation of all the inspectors
+	- the inspectors assess each column independently so the best partition is
+	found by dynamic programming over the columns, keeping the best <beam>
+	partial partitions per column
+
+The budget caps the number of candidate values of a record (they grow with
+k^2), records over the budget are merged greedily instead (see Repair.greedy);
+this bounds the time per row.
+A merge is accepted if every merged column has the agreement of more than one
+inspector (same acceptance criteria as the greedy merge)
+
+"""
+class MergeSolver:
+	"""
+
+	@param:
+		inspectors:	trained inspectors {id:Inspect}
+		ncols:		expected number of columns
+		clean:		function cleaning a row (see SampleBuilder.clean)
+		beam:		number of partial partitions kept per column
+		budget:		maximum number of candidate values per record
+
+	"""
+	def __init__(self,inspectors,ncols,clean,beam=16,budget=512):
+		self.inspectors	= inspectors
+		self.ncols	= ncols
+		self.clean	= clean
+		self.beam	= beam
+		self.budget	= budget
+	"""
+
+	This function returns the candidate spans of fields for every column
+
+	"""
+	def spans(self,n):
+		k = n - self.ncols
+		return [[(a,b) for a in range(j,j+k+1) for b in range(a+1,j+k+2)] for j in range(0,self.ncols)]
+	"""
+
+	This function scores the candidate values, the candidates are laid out as
+	rows (candidate t of column j is in row t) so that every inspector is
+	called once
+
+	"""
+	def score(self,row,spans):
+		T = max([len(c) for c in spans])
+		rows = [['' for j in range(0,self.ncols)] for t in range(0,T)]
+		for j in range(0,self.ncols):
+			for t in range(0,len(spans[j])):
+				a,b = spans[j][t]
+				rows[t][j] = " ".join([col.strip() for col in row[a:b]])
+		rows = [self.clean(r) for r in rows]
+		scores = np.sum([thread.evaluate(rows) for thread in self.inspectors.values()],axis=0)
+		return rows,scores
+	"""
+
+	This function tells whether a record of n fields is within the budget
+
+	"""
+	def fits(self,n):
+		return sum([len(c) for c in self.spans(n)]) <= self.budget
+	"""
+
+	This function returns the merged row or None if no acceptable merge was found
+
+	@pre
+		len(row) > self.ncols
+	"""
+	def solve(self,row):
+		n = len(row)
+		spans = self.spans(n)
+		if sum([len(c) for c in spans]) > self.budget:
+			return None
+		rows,scores = self.score(row,spans)
+		#
+		# states: last field covered -> (score, candidate index per column)
+		#
+		states = {0:(0,[])}
+		for j in range(0,self.ncols):
+			nstates = {}
+			for t in range(0,len(spans[j])):
+				a,b = spans[j][t]
+				if a not in states:
+					continue
+				value = states[a][0] + scores[t][j]
+				if b not in nstates or value > nstates[b][0]:
+					nstates[b] = (value,states[a][1] + [t])
+			if len(nstates) > self.beam:
+				ids = sorted(nstates,key=lambda b: -nstates[b][0])[:self.beam]
+				nstates = {b:nstates[b] for b in ids}
+			states = nstates
+		if n not in states:
+			return None
+		path = states[n][1]
+		N = len(self.inspectors)
+		threshold = 1/N #-- acceptance criteria
+		for j in range(0,self.ncols):
+			a,b = spans[j][path[j]]
+			if b - a > 1 and scores[path[j]][j]/N <= threshold:
+				return None
+		return [rows[path[j]][j] for j in range(0,self.ncols)]
+
+"""
+
+This class is designed to perform record repairs keeping the base class
+identical and allowing to assess repairs
+
+NOTE:
+	- The base class has taken upon itself to extract the sample
+	- The Inspector class hierarchy will use the sample found
+	- The base class keeps an index of broken records (offset,length,fields),
+	the records are read back from the input (mmap) when they are repaired
+	- Records with extra delimiters are merged by a MergeSolver (beam/budget),
+	with beam=0 the greedy merge is used instead
+
+"""
+class Repair(Filter):
+	INDEX = True
+	def __init__(self,path,ofolder='tmp',monitor=None,resume=False,checkpoint=100000,model=None,validate=True,link=False,profile=False,order=False,tag=False,shard=None,bootstrap=False,limits=None,beam=16,budget=512):
+		Filter.__init__(self,path,ofolder,monitor,resume,checkpoint,model,validate,link,profile,order,tag,shard,bootstrap,limits) ;
+		self.input	= None
+		#
+		# Training on the sample takes a fraction of the time of the filter pass, it is measured on its own
+		# When resuming (or given a model), the parameters are those of the checkpoint (model)
+		#
+		self.monitor.start('training')
+		self.threads = inspectors(self.sample)
+		if self.trained is not None and len(self.trained.get('inspectors',{})) > 0:
+			[self.threads[id].restore(self.trained['inspectors'][id]) for id in self.threads]
+		else:
+			[thread.start() for thread in self.threads.values()]
+			[thread.join() for thread in self.threads.values()]
+		self.monitor.stop('training',len(self.sample))
+		self.solver = MergeSolver(self.threads,self.ncols,self.clean,beam,budget) if beam > 0 else None
+		self.row_index = 0
+
+	"""
+
+	This function returns the parameters learnt by the inspectors
+
+	"""
+	def params(self):
+		return {id:self.threads[id].params() for id in self.threads}
+	"""
+
+	This function reads the i-th broken record back from the input file
+
+	@param:
+		i: position of the record in the index
+
+	"""
+	def fetch(self,i):
+		offset,length,fields = self.index[i]
+		line = self.input[offset:offset+length].decode('utf-8','replace')
+		return self.clean(line.split(self.xchar))
+	"""
+
+	This function posts the repair of the i-th broken record, the offset of the
+	repaired record in the fixed stream is kept in the index when the records
+	are to be ordered (see sequence)
+
+	"""
+	def fix(self,i,row):
+		self.position = (self.index.offsets[i],self.index.lengths[i],self.index.lines[i])
+		if self.order:
+			self.index.fixes[i] = self.handler.tell('fixed')
+			self.checkpoint.fix(i)
+		self.post('fixed',row)
+	def run(self):
+		phase,cursor = self.phase
+		if phase == 'filter':
+			self.scan(cursor) ;
+			phase,cursor = 'merge',0
+		ids = self.threads.keys()
+		#
+		# We need to make sure the threads have finished learning what they need to learn
+		# It is only possible to continue if the threads have completed so we can run the repairs
+		#
+		while True:
+			count = [ int(thread.is_alive() == False) for thread in self.threads.values()]
+			if sum(count) == len(ids):
+				break
+		#
+		# Now we can under take repairs:
+		#	a. Records with extra delimiters will require fields to be merged
+		#	b. Partial records will require they be aggregated with other records
+		#
+		if len(self.index) > 0:
+			f = open(self.path,'rb')
+			self.input = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+			self.repair(phase,cursor)
+			self.input.close()
+			f.close()
+			self.input = None
+		if self.order:
+			self.sequence()
+		print(self.logs)
+		self.report()
+		self.handler.close()
+		self.checkpoint.clear()
+	"""
+
+	This function repairs the broken records of the index (read from self.input)
+		a. Records with extra delimiters will require fields to be merged
+		b. Partial records will require they be aggregated with other records
+
+	@param:
+		phase:	stage to start from {merge,aggregate}
+		cursor:	position in the index to start the stage from
+		start:	position in the index of the first record to repair
+		end:	position in the index to stop at, the end of the index by default
+
+	"""
+	def repair(self,phase,cursor,start=0,end=None):
+		end = len(self.index) if end is None else end
+		every = self.checkpoint.every
+		self.monitor.start('merge')
+		N = 0
+		limits = self.limits
+		for i in range(cursor if phase == 'merge' else end,end):
+			if self.index.fields[i] > self.ncols:
+				if limits.exceeded() is not None:
+					limits.degrade('merge',i,sum([1 for k in range(i,end) if self.index.fields[k] != self.ncols]))
+					break
+				if limits.allows('fields',self.index.fields[i] - self.ncols) == False or limits.allows('length',self.index.lengths[i]) == False:
+					continue
+				row = self.merge(self.fetch(i))
+				if row is not None:
+					self.fix(i,row)
+				N += 1
+				if every > 0 and N % every == 0:
+					self.save('merge',i+1)
+		self.monitor.stop('merge',N)
+
+		self.monitor.start('aggregate')
+		N = 0
+		i = cursor if phase == 'aggregate' else start
+		while i < end and limits.spent is None:
+			if self.index.fields[i] < self.ncols:
+				if limits.exceeded() is not None:
+					limits.degrade('aggregate',i,sum([1 for k in range(i,end) if self.index.fields[k] < self.ncols]))
+					break
+				row,count = self.aggregate(i)
+				if row is not None:
+					self.fix(i,row)
+				i += count
+				N += count
+				if every > 0 and N % every < count:
+					self.save('aggregate',i)
+			else:
+				i += 1
+		self.monitor.stop('aggregate',N)
+
+	"""
+
+	The merge operation consists in addressing records with an extra
+	delimiter, the function will return the end-result
+
+	@pre
+		len(row) > self.ncols
+	@param:
+		row: row with extra delimiter
+
+	"""
+	def merge(self,row):
+		if self.solver is None or self.solver.fits(len(row)) == False:
+			return self.greedy(row)
+		self.monitor.merge_depth(len(row) - self.ncols)
+		return self.solver.solve(row)
+	"""
+
+	The greedy merge picks the first suspicious field, merges it left or right
+	and recurses until the record has the expected number of fields
+
+	@param:
+		row: row with extra delimiter
+		depth: recursion depth of the merge
+
+	"""
+	def greedy(self,row,depth=1):
+		if self.limits.allows('depth',depth) == False:
+			return None
+		#
+		# Let's find a record that is out of place, 
+		# A merger would require an alpha-numeric field to be involved,
+		# Misplaced fields are identified by either a disagreement upon inspection of a field having data or not or an agreement with the wrong data type
+		# @TODO: Consider adding inspecting type to make sure typing disagreement
+		#
+		pn = self.threads['numeric'].inspect(row)
+		px = self.threads['px'].inspect(row[0:self.ncols])
+		
+		for i in range(0,self.ncols):
+			
+			#if px[i] == pi[i] and pn[i] == 0 :
 			if (px[i] == 1 and pn[i] == 0) or px[i] == 0 :
 				break
 		rmrow = []	#-- right merge row, what the row would be like should it be merged right
@@ -695,6 +2770,7 @@ class Repair(Filter):
 				rmrow = self.clean(rmrow)
 				del rmrow [i]
 		else:
+			self.monitor.merge_depth(depth)
 			return None
 		#
 		# We find the best probabilistic fit for the evaluation we have performed 
@@ -717,6 +2793,8 @@ class Repair(Filter):
 		# At this point we need to inspect if the length of the rows match expectations
 		# If not we continue the merge process until the row doesn't meet the preconditions to be processed here
 		#
+		if len(nrow) <= self.ncols :
+			self.monitor.merge_depth(depth)
 		if len(nrow) == self.ncols :
 			#
 			# We are settle on the merger and we should return the value
@@ -733,7 +2811,7 @@ class Repair(Filter):
 			#
 			# At this point we assume there are more unexpected delimiters
 			#
-			return self.merge(nrow)
+			return self.greedy(nrow,depth+1)
 		else:
 			return None
 
@@ -743,31 +2821,558 @@ class Repair(Filter):
 	unexpected new line i.e the number of features would less than
 	expectated number of features
 
+	The partial record at position i of the index is concatenated with the
+	partial records that immediately follow it in the file (adjacent offsets)
+	until the expected number of features is reached
+
+	@param:
+		i: position of the partial record in the index
+	@return:
+		(repaired row or None, number of partial records consumed)
+
 	"""
-	def aggregate(self,row):
-		
-		index = [i for i in range(0,len(self.partial)) if self.partial[i] == row]
-		index = index[0] + 1
-		nrow	= list(row)
-		for i in range(index,len(self.partial)) :
-			#if row == self.partial[i]:
-			#	continue ;
-			next_row = list(self.partial[i])
-			#value = nrow[len(nrow)-1] +' '+ next_row[0]
-			#nrow[len(nrow)-1] = value
-			#del next_row[0]
-			nrow = nrow + next_row ; #self.partial[i]
+	def aggregate(self,i):
+		offset,length,fields = self.index[i]
+		nrow	= self.fetch(i)
+		j = i + 1
+		while j < len(self.index) :
+			o,l,f = self.index[j]
+			if o != offset + length or f >= self.ncols:
+				break
+			if self.limits.allows('span',j - i + 1) == False:
+				return None,1
+			nrow = nrow + self.fetch(j)
+			offset,length = o,l
+			j += 1
 			
 			if len(nrow) > self.ncols:
 				r = self.merge(nrow)
 				if r is not None:
 					nrow = r
 				else:
-					del self.partial[0:i]
-					return None;
+					return None,1
 			
 			if len(nrow) == self.ncols:
-				del self.partial[0:i]
-				return nrow 
-		return None
-				
+				return nrow,j-i
+		return None,1
+
+"""
+
+This class is designed to follow a file that keeps growing (appended to): the
+file is sampled and the inspectors trained once, then the file is polled and
+only the bytes appended since the last poll are filtered & repaired.
+
+NOTE:
+	- A poll stops at the last new line of the file, a partial trailing line is
+	left for the next poll to read once it is complete
+	- Partial records at the very end of what has been read may be completed by
+	the next lines to be appended, they are held until then (see held)
+	- The records written are never re-written so a poll costs in proportion to
+	what has been appended, a report is written to the logs after every poll
+	that found new records
+	- The file is followed as long as it grows, should it shrink (truncated or
+	rotated) following stops
+	- Checkpoints & the validate fast path are not used (the end of the file moves)
+
+"""
+class Follow(Repair):
+	"""
+
+	@param:
+		path:		path of the file to follow
+		ofolder:	output folder
+		interval:	seconds between polls
+		polls:		number of polls before stopping, none to follow until stop is called
+		options:	options of Repair (monitor,model,beam,budget,profile,order,tag,...)
+
+	"""
+	def __init__(self,path,ofolder='tmp',interval=1.0,polls=None,**options):
+		options.update({'resume':False,'checkpoint':0,'validate':False})
+		Repair.__init__(self,path,ofolder,**options)
+		self.interval	= interval
+		self.polls	= polls
+		self.cursor	= 0	#-- offset up to which the file has been read (line boundary)
+		self.done	= 0	#-- position in the index up to which broken records have been repaired
+		self.running	= True
+	def stop(self):
+		self.running = False
+	"""
+
+	This function returns the offset following the last new line of the file
+	that is beyond the cursor (the cursor itself if there is none)
+
+	@param:
+		size:	current size of the file
+
+	"""
+	def boundary(self,size):
+		f = open(self.path,'rb')
+		end = size
+		while end > self.cursor:
+			start = max(self.cursor,end - self.BLOCK)
+			f.seek(start)
+			block = f.read(end - start)
+			i = block.rfind(b'\n')
+			if i >= 0:
+				f.close()
+				return start + i + 1
+			end = start
+		f.close()
+		return self.cursor
+	"""
+
+	This function returns the position in the index of the first of the partial
+	records that end the part of the file read so far (adjacent records with
+	less fields than expected), they may be completed by lines yet to come
+
+	"""
+	def held(self):
+		k	= len(self.index)
+		end	= self.cursor
+		while k > self.done and self.index.fields[k-1] < self.ncols and self.index.offsets[k-1] + self.index.lengths[k-1] == end:
+			k	-= 1
+			end	= self.index.offsets[k]
+		return k
+	"""
+
+	This function repairs the broken records of the index from the last repaired
+	up to the given position and writes them out (ordered stream included)
+
+	@param:
+		end:	position in the index to stop at
+
+	"""
+	def flush(self,end):
+		if end > self.done:
+			f = open(self.path,'rb')
+			self.input = mmap.mmap(f.fileno(),self.cursor,access=mmap.ACCESS_READ)
+			self.repair('merge',self.done,self.done,end)
+			self.input.close()
+			f.close()
+			self.input = None
+			self.done = end
+		if self.order:
+			self.sequence(end)
+	"""
+
+	This function reads what has been appended to the file since the last poll
+	and returns the number of bytes read (-1 if the file has shrunk)
+
+	"""
+	def poll(self):
+		size = os.path.getsize(self.path)
+		if size < self.cursor:
+			return -1
+		end = self.boundary(size)
+		if end == self.cursor:
+			return 0
+		self.scan(self.cursor,end)
+		start,self.cursor = self.cursor,end
+		self.flush(self.held())
+		self.report()
+		return end - start
+	def run(self):
+		N = 0
+		while self.running and (self.polls is None or N < self.polls):
+			if self.poll() < 0:
+				break
+			N += 1
+			if self.running and (self.polls is None or N < self.polls):
+				time.sleep(self.interval)
+		#
+		# Records held for lines that will not come are repaired with what is available
+		#
+		if len(self.index) > self.done or self.order:
+			self.flush(len(self.index))
+			self.report()
+		self.handler.close()
+
+"""
+
+This function returns the inspectors used to assess records (not trained)
+
+"""
+def inspectors(sample):
+	return {'px':InspectProbability(sample),'numeric':InspectNumericField(sample),'len':InspectFieldLength(sample),'date':InspectDateField(sample)}
+
+"""
+
+This function samples a file and returns its findings (model): delimiter,
+number of columns, sample and the parameters of the trained inspectors. A model
+can be handed to Filter/Repair to process files of the same schema without
+sampling & training them again
+
+@param:
+	path:	path of the file to sample
+	mode:	filter|repair (inspectors are only trained for repairs)
+	size:	size of the sample
+	bootstrap:	confirm the delimiter & number of columns on random samples (see Bootstrap)
+
+"""
+def learn(path,mode='repair',size=1000,bootstrap=False):
+	thread = SampleBuilder(path,size,None,bootstrap)
+	model = {'xchar':thread.xchar,'ncols':thread.ncols,'sample':thread.sample,'inspectors':{},'estimate':thread.estimate}
+	if mode == 'repair':
+		threads = inspectors(thread.sample)
+		[t.start() for t in threads.values()]
+		[t.join() for t in threads.values()]
+		model['inspectors'] = {id:threads[id].params() for id in threads}
+	return model
+
+"""
+
+This function processes a file in a worker process of a batch (see Batch)
+
+"""
+def process(path,ofolder,mode,model,options):
+	engine = Repair if mode == 'repair' else Filter
+	thread = engine(path,ofolder,model=model,**options)
+	thread.run()
+	return thread.summary
+
+"""
+
+This class is designed to process many files (a folder or a glob pattern) with a
+shared pool of worker processes:
+	- files are scheduled largest first so that the pool isn't waiting on a big
+	file at the end
+	- files sharing a schema (same header line) share a model that is learnt
+	once from the largest of them
+	- the reports of every file are aggregated in a report written to
+	<ofolder>/logs/batch.json
+	- files sharing a name are written to sub-folders of <ofolder> (see folders)
+
+	from repair import Batch
+	thread = Batch('<folder-or-glob>',<'output-folder'>,'repair',workers=4)
+	thread.start()
+
+"""
+class Batch(Thread):
+	"""
+
+	@param:
+		source:	folder or glob pattern
+		ofolder:output folder
+		mode:	filter|repair
+		workers:number of worker processes (defaults to the number of cpus)
+		options:other parameters of Filter/Repair (checkpoint, beam, budget ...)
+
+	"""
+	def __init__(self,source,ofolder='tmp',mode='repair',workers=None,**options):
+		Thread.__init__(self)
+		self.source	= source
+		self.ofolder	= ofolder
+		self.mode	= mode
+		self.workers	= workers
+		self.options	= options
+		self.summary	= None
+	"""
+
+	This function returns the files to be processed, largest first
+
+	"""
+	def files(self):
+		if os.path.isdir(self.source):
+			paths = [os.sep.join([self.source,name]) for name in os.listdir(self.source)]
+		else:
+			paths = glob.glob(self.source)
+		paths = [path for path in paths if os.path.isfile(path)]
+		return sorted(paths,key=lambda path: -os.path.getsize(path))
+	"""
+
+	This function returns the output folder of every file: outputs are named after
+	the file so files sharing a name (e.g a/x.csv & b/x.csv with a glob pattern) are
+	written to sub-folders named after their folders (relative to the folders of the files)
+
+	"""
+	def folders(self,files):
+		names = {}
+		for path in files:
+			names[os.path.basename(path)] = names.get(os.path.basename(path),0) + 1
+		root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files]) if len(files) > 0 else None
+		r = {}
+		for path in files:
+			if names[os.path.basename(path)] > 1:
+				r[path] = os.path.normpath(os.sep.join([self.ofolder,os.path.relpath(os.path.dirname(os.path.abspath(path)),root)]))
+			else:
+				r[path] = self.ofolder
+		return r
+	"""
+
+	This function returns the schema of a file i.e a signature of its header line
+
+	"""
+	def schema(self,path):
+		f = open(path,'rb')
+		header = f.readline().strip()
+		f.close()
+		return hashlib.md5(header).hexdigest()
+	def run(self):
+		started = time.time()
+		files = self.files()
+		schemas = {}
+		for path in files:
+			key = self.schema(path)
+			if key not in schemas:
+				schemas[key] = []
+			schemas[key].append(path)
+		#
+		# The files are sorted by size, the first file of a schema is its largest
+		#
+		models = {key:learn(schemas[key][0],self.mode,bootstrap=self.options.get('bootstrap',False)) for key in schemas}
+		keys = {path:key for key in schemas for path in schemas[key]}
+		reports = []
+		errors = {}
+		folders = self.folders(files)
+		pool = ProcessPoolExecutor(self.workers)
+		jobs = {pool.submit(process,path,folders[path],self.mode,models[keys[path]],self.options):path for path in files}
+		for job in as_completed(jobs):
+			try:
+				reports.append(job.result())
+			except Exception as e:
+				errors[jobs[job]] = str(e)
+		pool.shutdown()
+		self.summary = self.aggregate(reports)
+		self.summary.update({'files':len(files),'schemas':len(schemas),'errors':errors,'elapsed':time.time() - started})
+		folder = os.sep.join([self.ofolder,'logs'])
+		if os.path.exists(folder) == False:
+			os.makedirs(folder)
+		f = open(os.sep.join([folder,'batch.json']),'w')
+		json.dump(self.summary,f)
+		f.close()
+	"""
+
+	This function aggregates the reports of the files (counts & stages)
+
+	"""
+	def aggregate(self,reports):
+		counts = {}
+		stages = {}
+		for r in reports:
+			for id in r['counts']:
+				counts[id] = counts.get(id,0) + r['counts'][id]
+			for id in r['stages']:
+				if id not in stages:
+					stages[id] = {}
+				for key in ['calls','wall','cpu','rows','bytes_read','bytes_written']:
+					stages[id][key] = stages[id].get(key,0) + r['stages'][id][key]
+		return {'counts':counts,'stages':stages,'reports':reports}
+
+"""
+
+This class is designed to estimate the cost of a job before it is run (pre-flight)
+i.e the time it would take, the memory it would need and the size of its outputs
+in either mode and for a number of worker processes:
+	- the findings of every schema are learnt as a batch would (SampleBuilder &
+	training of the inspectors on the largest file of the schema), they are timed
+	- a miniature of the file is drawn: blocks of consecutive lines at random
+	offsets (consecutive so that records split over lines stay together), it is
+	processed by a Repair with the options of the job
+	- the cost per line (filter), the cost per broken record (merge & aggregate),
+	the rate of broken & fixed records and the bytes of every stream per line are
+	measured on the miniature and projected on the files (number of lines from
+	their size)
+	- files are scheduled on the workers the way a batch schedules them (largest
+	first), the runtime is the time of the busiest worker and the memory that of
+	the largest files processed at the same time
+
+The memory of a job is the resident memory of a worker (engine & sample loaded)
+and of the repair buffers: the index of broken records (see Index), the pages of
+the input they are read back from, the records a checkpoint appends and
+the records buffered by shards. Times are in seconds, memory in MB and outputs in bytes
+
+	from repair import Estimator
+	r = Estimator('<folder-or-glob>',workers=[1,4,8],beam=16).run()
+	r['modes']['repair']['runtime'][4]
+
+"""
+class Estimator:
+	PAGE	= 4096
+	REPEAT	= 2
+	VALIDATOR = 14	#-- bytes the validator holds per byte of a block (masks, counts as int64)
+	MASKS	= 4	#-- bytes it holds per byte of a block that isn't clean (it stops at the masks)
+	"""
+
+	@param:
+		source:	file, folder or glob pattern (see Batch)
+		rows:	number of lines of the miniature of a schema
+		blocks:	number of blocks of consecutive lines the miniature is made of
+		workers:numbers of worker processes to project for, powers of 2 up to the number of cpus by default
+		cpus:	number of cpus of the node the job is to run on (defaults to this one's), workers share them
+		seed:	seed of the random offsets
+		options:options of Filter/Repair (beam, budget, order, tag, shard, checkpoint ...)
+
+	"""
+	def __init__(self,source,rows=2000,blocks=16,workers=None,cpus=None,seed=0,**options):
+		self.source	= source
+		self.rows	= rows
+		self.blocks	= blocks
+		self.cpus	= cpus if cpus is not None else (os.cpu_count() or 1)
+		self.workers	= workers if workers is not None else [2**k for k in range(0,int(math.log(self.cpus,2))+1)]
+		self.seed	= seed
+		self.options	= options
+	"""
+
+	This function returns the miniature of a file (bytes): the first block starts
+	at the head of the file (header), the others at random offsets (a line cut by
+	an offset is skipped), blocks don't overlap
+
+	"""
+	def draw(self,path):
+		size = os.path.getsize(path)
+		f = open(path,'rb')
+		if size <= 1 << 16 or self.blocks <= 1:
+			lines = f.readlines()
+			if len(lines) <= self.rows:
+				f.close()
+				return b''.join(lines)
+			f.seek(0)
+		generator = random.Random(self.seed)
+		offsets = [0] + sorted(generator.randrange(1,size) for i in range(1,self.blocks)) if size > 1 else [0]
+		count = max(1,int(self.rows/len(offsets)))
+		data = []
+		end = 0
+		for offset in offsets:
+			if offset < end:
+				continue
+			f.seek(offset)
+			if offset > 0:
+				f.readline()
+			for i in range(0,count):
+				line = f.readline()
+				if len(line) == 0:
+					break
+				data.append(line if line.endswith(b'\n') else line + b'\n')
+			end = f.tell()
+		f.close()
+		return b''.join(data)
+	"""
+
+	This function measures the costs & rates of a schema on the miniature of its
+	largest file
+
+	"""
+	def measure(self,path):
+		options = dict(self.options)
+		bootstrap = options.pop('bootstrap',False)
+		started = time.perf_counter()
+		model = learn(path,'filter',bootstrap=bootstrap)
+		sampling = time.perf_counter() - started
+		started = time.perf_counter()
+		threads = inspectors(model['sample'])
+		[thread.start() for thread in threads.values()]
+		[thread.join() for thread in threads.values()]
+		model['inspectors'] = {id:threads[id].params() for id in threads}
+		training = time.perf_counter() - started
+
+		folder = tempfile.mkdtemp(prefix='estimate-')
+		try:
+			target = os.sep.join([folder,os.path.basename(path)])
+			f = open(target,'wb')
+			f.write(self.draw(path))
+			f.close()
+			options.update({'resume':False,'checkpoint':0,'model':model})
+			#
+			# The first run warms the caches (types, patterns) up, the fastest run is kept
+			#
+			best = None
+			for i in range(0,self.REPEAT):
+				started = time.perf_counter()
+				thread = Repair(target,os.sep.join([folder,'out']),**options)
+				thread.run()
+				elapsed = time.perf_counter() - started
+				if best is None or elapsed < best[1]:
+					best = (thread,elapsed)
+			thread,elapsed = best
+			lines = max(1,thread.lines or thread.logs.get('passed',0))	#-- a clean miniature is copied (see Filter.copy)
+			size = os.path.getsize(target)
+			outputs = {}
+			for id,value in thread.handler.sizes().items():
+				id = id if id in thread.handler.streams else os.path.basename(os.path.dirname(id))
+				if id != 'logs':
+					outputs[id] = outputs.get(id,0) + value
+			memory = Budget().memory()
+		finally:
+			shutil.rmtree(folder,True)
+		#
+		# Records are written as they are scanned (the write stage is within the filter stage) unless the file is copied
+		#
+		stages = thread.summary['stages']
+		wall = lambda ids: sum([stages[id]['wall'] for id in ids if id in stages])
+		scan = wall(['validate','filter','order','profile'] + (['write'] if 'filter' not in stages else []))
+		repairs = wall(['merge','aggregate'])
+		broken = thread.logs.get('broken',0)
+		r = {'xchar':model['xchar'],'ncols':model['ncols'],'lines':lines,'bytes':size,'counts':dict(thread.logs),'copied':'filter' not in stages,'validated':'validate' in stages}
+		r['rates'] = {'broken':broken/lines,'fixed':thread.logs.get('fixed',0)/lines,'line_bytes':size/lines}
+		r['costs'] = {'sampling':sampling,'training':training,'job':max(0,elapsed - scan - repairs - wall(['training'])),'line':scan/lines,'broken':repairs/broken if broken > 0 else 0}
+		r['outputs'] = {id:outputs[id]/lines for id in outputs}
+		r['memory'] = memory
+		return r
+	"""
+
+	This function returns the projected time, memory & outputs of a file in a mode
+
+	@param:
+		info:	measures of the schema of the file (see measure)
+		size:	size of the file
+
+	"""
+	def project(self,info,size,mode):
+		lines = size/info['rates']['line_bytes']
+		broken = lines*info['rates']['broken']
+		runtime = info['costs']['job'] + lines*info['costs']['line']
+		if mode == 'repair':
+			runtime += broken*info['costs']['broken']
+		index = 30*broken/(1 << 20)
+		memory = {'base':info['memory'],'index':index}
+		if mode == 'repair':
+			memory['mapped'] = min(size,broken*self.PAGE)/(1 << 20)
+		if self.options.get('checkpoint',100000) > 0:
+			memory['checkpoint'] = Index.RECORD.size*min(broken,self.options.get('checkpoint',100000))/(1 << 20)	#-- records added since the last checkpoint (see Checkpoint.store)
+		shard = self.options.get('shard')
+		if shard is not None:
+			parts = shard.get('parts',8) if shard.get('column') is not None else 1
+			memory['shards'] = len(Shards.SHARDED)*parts*Shards.BATCH*info['rates']['line_bytes']/(1 << 20)
+		#
+		# The validator is done with its buffers (a block of the file at most) before records are indexed
+		#
+		validator = min(size,Validator.BLOCK)*(self.VALIDATOR if info['copied'] else self.MASKS)/(1 << 20) if info['validated'] else 0
+		outputs = {id:int(lines*info['outputs'][id]) for id in info['outputs'] if mode == 'repair' or id not in ['fixed','ordered']}
+		if mode == 'filter' and 'ordered' in info['outputs']:
+			outputs['ordered'] = outputs.get('passed',0)
+		total = memory['base'] + max(validator,sum(memory.values()) - memory['base'])
+		memory['validator'] = validator
+		return {'lines':int(lines),'broken':int(broken),'runtime':runtime,'memory':total,'buffers':memory,'outputs':outputs}
+	def run(self):
+		started = time.perf_counter()
+		batch = Batch(self.source)
+		files = batch.files()
+		schemas = {}
+		for path in files:
+			schemas.setdefault(batch.schema(path),[]).append(path)
+		measures = {key:self.measure(schemas[key][0]) for key in schemas}
+		keys = {path:key for key in schemas for path in schemas[key]}
+		r = {'files':len(files),'bytes':sum([os.path.getsize(path) for path in files]),'schemas':{},'modes':{}}
+		for key,info in measures.items():
+			r['schemas'][key] = dict(info,files=len(schemas[key]))
+		for mode in ['filter','repair']:
+			jobs = [self.project(measures[keys[path]],os.path.getsize(path),mode) for path in files]
+			fixed = sum([info['costs']['sampling'] + (info['costs']['training'] if mode == 'repair' else 0) for info in measures.values()])
+			runtime,memory = {},{}
+			for n in self.workers:
+				#
+				# Files are handed (largest first) to the worker that is free first, workers beyond the cpus wait on them
+				#
+				load = [0]*max(1,n)
+				for job in jobs:
+					k = load.index(min(load))
+					load[k] += job['runtime']
+				runtime[n] = fixed + max(max(load),sum(load)/self.cpus)
+				memory[n] = sum(sorted([job['memory'] for job in jobs],reverse=True)[:max(1,n)])
+			outputs = {}
+			for job in jobs:
+				for id in job['outputs']:
+					outputs[id] = outputs.get(id,0) + job['outputs'][id]
+			r['modes'][mode] = {'lines':sum([job['lines'] for job in jobs]),'broken':sum([job['broken'] for job in jobs]),'runtime':runtime,'memory':memory,'outputs':outputs,'files':{path:jobs[i] for i,path in enumerate(files)}}
+		r['elapsed'] = time.perf_counter() - started
+		return r
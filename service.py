@@ -0,0 +1,379 @@
+"""
+Weiyi Xia <xwy0220@gmail.com>
+Steve L. Nyemba<steve@the-phi.com>
+
+This file implements a long running repair service: delimited data is submitted
+over HTTP or a local (unix) socket and the passed, fixed & broken records are
+returned. The service saves every request the cost of starting an interpreter,
+importing the engine, sampling & training:
+	- the worker processes (engine loaded) are started once
+	- the findings (model, see repair.learn) of every schema (header line)
+	are kept in memory, a schema is only learnt from the first upload that has it
+
+Requests are handled concurrently (asyncio), uploads are streamed to a
+temporary file and processed by the worker processes.
+
+HTTP:
+	POST /repair | /filter	the body is the data (Content-Length or chunked),
+				query parameters are options (beam,budget,tag,order,profile,validate)
+	GET /health		status & number of models in memory
+	GET /models		schemas & findings (delimiter, columns) of the models in memory
+
+	The response is a JSON document {counts,passed,fixed,broken,report}
+
+Local socket:
+	The request is a line of JSON options (mode,name, and the options above)
+	followed by the data, the client closes its end of the connection when the
+	data has been sent. The response is the same JSON document
+
+In order to execute the program
+
+	python service.py --port 8080 --socket /tmp/repair.sock --workers 4
+
+	from service import Service
+	thread = Service(port=8080)
+	thread.start()
+
+"""
+from __future__ import print_function
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from threading import Thread, Event
+from concurrent.futures import ProcessPoolExecutor
+try:
+	from urllib.parse import urlsplit, parse_qs
+except ImportError:
+	from urlparse import urlsplit, parse_qs
+import repair
+
+"""
+
+This class is designed to tell the errors of a request (400) from the errors of
+the service (500)
+
+"""
+class RequestError(ValueError):
+	pass
+
+"""
+
+This function processes an upload in a worker process, it returns the output
+streams and the report of the job
+
+@param:
+	path:	path of the upload
+	folder:	output folder of the job
+	mode:	filter|repair
+	model:	findings of the schema (see repair.learn)
+	options:options of Filter/Repair
+
+"""
+def serve(path,folder,mode,model,options):
+	summary = repair.process(path,folder,mode,model,options)
+	name = os.path.basename(path)
+	r = {'counts':summary['counts'],'report':summary}
+	for id in ['passed','fixed','broken','ordered']:
+		target = os.sep.join([folder,id,name])
+		if os.path.exists(target):
+			f = open(target,'r')
+			r[id] = f.read()
+			f.close()
+	return r
+
+class Service(Thread):
+	BLOCK	= 1 << 16
+	OPTIONS	= {'beam':int,'budget':int,'tag':'flag','order':'flag','profile':'flag','validate':'flag'}
+	"""
+
+	@param:
+		host:	interface of the HTTP server
+		port:	port of the HTTP server, none for no HTTP server
+		path:	path of the local socket, none for no local socket
+		workers:number of worker processes (defaults to the number of cpus)
+		folder:	folder of the temporary files (defaults to the system's)
+		size:	size of the sample a model is learnt from
+
+	"""
+	def __init__(self,host='127.0.0.1',port=8080,path=None,workers=None,folder=None,size=1000):
+		Thread.__init__(self)
+		self.host	= host
+		self.port	= port
+		self.path	= path
+		self.workers	= workers
+		self.folder	= folder
+		self.size	= size
+		self.models	= {}	#-- schema -> model (future while it is learnt)
+		self.pool	= None
+		self.loop	= None
+		self.done	= None
+		self.ready	= Event()	#-- set once the servers are listening
+	"""
+
+	This function returns the schema of an upload i.e a signature of its header line
+
+	"""
+	def schema(self,path):
+		f = open(path,'rb')
+		header = f.readline().strip()
+		f.close()
+		return hashlib.md5(header).hexdigest()
+	"""
+
+	This function returns the model of the schema of an upload, it is learnt
+	(once) from the upload if the schema is unknown. A model is only kept if it
+	was learnt from a full sample, a model learnt from a small upload serves that
+	upload only (the next upload of the schema learns it again)
+
+	"""
+	async def model(self,path):
+		key = self.schema(path)
+		if key not in self.models:
+			self.models[key] = self.loop.run_in_executor(self.pool,repair.learn,path,'repair',self.size)
+		future = self.models[key]
+		if isinstance(future,dict):
+			return future
+		try:
+			model = await future
+			self.check(model)
+		except Exception:
+			if self.models.get(key) is future:
+				self.models.pop(key)
+			raise
+		if self.models.get(key) is future:
+			if len(model['sample']) >= self.size:
+				self.models[key] = model
+			else:
+				self.models.pop(key)
+		return model
+	"""
+
+	This function makes sure a model can be used for repairs: the sample has
+	records besides the header and every inspector was trained on every column
+
+	"""
+	def check(self,model):
+		if len(model['sample']) < 2:
+			raise RequestError('not enough records to learn from')
+		for params in model['inspectors'].values():
+			if any([len(values) != model['ncols'] for values in params.values()]):
+				raise RequestError('the records could not be learnt from')
+	"""
+
+	This function learns the model of a file ahead of requests of its schema
+
+	"""
+	def warm(self,path):
+		model = repair.learn(path,'repair',self.size)
+		self.check(model)
+		self.models[self.schema(path)] = model
+	"""
+
+	This function returns the options of a request given as strings (query parameters)
+
+	"""
+	def options(self,values):
+		r = {}
+		for id in self.OPTIONS:
+			if id in values:
+				value = values[id]
+				try:
+					r[id] = str(value).lower() in ['1','true','yes'] if self.OPTIONS[id] == 'flag' else self.OPTIONS[id](value)
+				except ValueError:
+					raise RequestError('invalid value of %s: %s' % (id,value))
+		r['checkpoint'] = 0
+		return r
+	"""
+
+	This function processes an upload once it has been written to a file
+
+	@param:
+		path:	path of the upload (in a folder of its own)
+		mode:	filter|repair
+		options:options of Filter/Repair
+
+	"""
+	async def process(self,path,mode,options):
+		if os.path.getsize(path) == 0:
+			raise RequestError('no data')
+		model = await self.model(path)
+		folder = os.sep.join([os.path.dirname(path),'out'])
+		return await self.loop.run_in_executor(self.pool,serve,path,folder,mode,model,options)
+	"""
+
+	This function creates the file an upload is written to
+
+	"""
+	def create(self,name):
+		folder = tempfile.mkdtemp(prefix='repair-',dir=self.folder)
+		name = os.path.basename(name) or 'upload.csv'
+		return os.sep.join([folder,name])
+	"""
+
+	This function copies data from a stream to a file
+
+	@param:
+		size:	number of bytes to copy, none to copy until the end of the stream
+
+	"""
+	async def copy(self,reader,f,size=None):
+		while size is None or size > 0:
+			block = await reader.read(self.BLOCK if size is None else min(self.BLOCK,size))
+			if len(block) == 0:
+				break
+			f.write(block)
+			if size is not None:
+				size -= len(block)
+	"""
+
+	This function copies a chunked body (HTTP) to a file
+
+	"""
+	async def chunks(self,reader,f):
+		while True:
+			line = (await reader.readline()).split(b';')[0].strip()
+			try:
+				size = int(line,16)
+			except ValueError:
+				raise RequestError('invalid chunk size')
+			if size == 0:
+				while (await reader.readline()).strip() != b'':
+					pass
+				break
+			await self.copy(reader,f,size)
+			await reader.readline()
+	async def respond(self,writer,status,body):
+		data = json.dumps(body).encode('utf-8')
+		reasons = {200:'OK',400:'Bad Request',404:'Not Found',500:'Internal Server Error'}
+		head = 'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % (status,reasons[status],len(data))
+		writer.write(head.encode('ascii') + data)
+		await writer.drain()
+		writer.close()
+	"""
+
+	This function handles an HTTP request
+
+	"""
+	async def http(self,reader,writer):
+		path = None
+		try:
+			line = (await reader.readline()).decode('latin-1').split()
+			if len(line) < 2:
+				writer.close()
+				return
+			method,target = line[0],urlsplit(line[1])
+			headers = {}
+			while True:
+				header = (await reader.readline()).decode('latin-1')
+				if header.strip() == '':
+					break
+				if ':' not in header:
+					raise RequestError('invalid header')
+				id,value = header.split(':',1)
+				headers[id.strip().lower()] = value.strip()
+			query = {id:values[-1] for id,values in parse_qs(target.query).items()}
+			if method == 'GET' and target.path == '/health':
+				return await self.respond(writer,200,{'status':'ok','models':len(self.models)})
+			if method == 'GET' and target.path == '/models':
+				models = {key:{'xchar':model['xchar'],'ncols':model['ncols']} for key,model in self.models.items() if isinstance(model,dict)}
+				return await self.respond(writer,200,models)
+			mode = target.path.strip('/')
+			if method != 'POST' or mode not in ['repair','filter']:
+				return await self.respond(writer,404,{'error':'not found'})
+			if headers.get('content-length','0').isdigit() == False:
+				raise RequestError('invalid content length')
+			options = self.options(query)
+			#
+			# Clients waiting to be told to send the body (curl does for large uploads) are told right away
+			#
+			if headers.get('expect','').lower() == '100-continue':
+				writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+				await writer.drain()
+			path = self.create(headers.get('x-filename',query.get('name','upload.csv')))
+			f = open(path,'wb')
+			if headers.get('transfer-encoding','').lower() == 'chunked':
+				await self.chunks(reader,f)
+			else:
+				await self.copy(reader,f,int(headers.get('content-length','0')))
+			f.close()
+			r = await self.process(path,mode,options)
+			await self.respond(writer,200,r)
+		except RequestError as e:
+			await self.respond(writer,400,{'error':str(e)})
+		except Exception as e:
+			await self.respond(writer,500,{'error':str(e)})
+		finally:
+			if path is not None:
+				shutil.rmtree(os.path.dirname(path),True)
+	"""
+
+	This function handles a request made over the local socket
+
+	"""
+	async def local(self,reader,writer):
+		path = None
+		try:
+			try:
+				info = json.loads((await reader.readline()).decode('utf-8'))
+			except ValueError:
+				raise RequestError('the first line must be the options (json)')
+			mode = info.get('mode','repair')
+			if mode not in ['repair','filter']:
+				raise RequestError('unknown mode '+str(mode))
+			options = self.options(info)
+			path = self.create(info.get('name','upload.csv'))
+			f = open(path,'wb')
+			await self.copy(reader,f)
+			f.close()
+			r = await self.process(path,mode,options)
+		except Exception as e:
+			r = {'error':str(e)}
+		finally:
+			if path is not None:
+				shutil.rmtree(os.path.dirname(path),True)
+		writer.write(json.dumps(r).encode('utf-8'))
+		await writer.drain()
+		writer.close()
+	async def serve(self):
+		self.loop	= asyncio.get_running_loop()
+		self.done	= asyncio.Event()
+		servers = []
+		if self.port is not None:
+			servers.append(await asyncio.start_server(self.http,self.host,self.port))
+		if self.path is not None:
+			if os.path.exists(self.path):
+				os.remove(self.path)
+			servers.append(await asyncio.start_unix_server(self.local,self.path))
+		self.ready.set()
+		await self.done.wait()
+		for server in servers:
+			server.close()
+			await server.wait_closed()
+	def run(self):
+		self.pool = ProcessPoolExecutor(self.workers)
+		try:
+			asyncio.run(self.serve())
+		finally:
+			self.pool.shutdown()
+			if self.path is not None and os.path.exists(self.path):
+				os.remove(self.path)
+	def stop(self):
+		if self.loop is not None:
+			self.loop.call_soon_threadsafe(self.done.set)
+
+if __name__ == '__main__':
+	import argparse
+	parser = argparse.ArgumentParser(description='Serves repairs of character delimited data over HTTP and/or a local socket')
+	parser.add_argument('--host',default='127.0.0.1')
+	parser.add_argument('--port',type=int,default=8080,help='port of the HTTP server (0 for none)')
+	parser.add_argument('--socket',default=None,help='path of the local socket')
+	parser.add_argument('--workers',type=int,default=None,help='number of worker processes')
+	parser.add_argument('--warm',nargs='*',default=[],help='files whose schema is learnt at start')
+	args = parser.parse_args()
+	thread = Service(args.host,args.port if args.port > 0 else None,args.socket,args.workers)
+	[thread.warm(path) for path in args.warm]
+	thread.start()
+	thread.join()